@@ -1,7 +1,37 @@
+import importlib
+import json
+import sys
+import time
+from types import ModuleType
+from typing import Optional, Tuple
+
 import streamlit as st
-from pages_app import add_demografico, cargar_datos, generar_cluster, vizualizacion
+from utils.profiling import (
+    Trace, profiled, record_startup, set_memory_tracking, startup_times, tracing
+)
 import config
 
+# Cada página se importa la primera vez que se visita: sus dependencias (scikit-learn,
+# plotly, xlsxwriter...) no se cargan hasta que hacen falta.
+PAGES = {
+    "Carga de datos": "pages_app.cargar_datos",
+    "Clustering": "pages_app.generar_cluster",
+    "Visualización": "pages_app.vizualizacion",
+    "Demográficos": "pages_app.add_demografico",
+}
+
+
+@profiled
+def load_page(module_name: str) -> Tuple[ModuleType, float]:
+    """Importa el módulo de una página; devuelve el módulo y el tiempo de importación."""
+    cold = module_name not in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    if cold:
+        record_startup(f"import {module_name}", elapsed)
+    return module, elapsed
+
 
 def set_custom_styles() -> None:
     """Aplica estilos personalizados a los botones de la app."""
@@ -21,8 +51,60 @@ def set_custom_styles() -> None:
     )
 
 
+class DiagnosticsPanel:
+    """Panel opcional de la barra lateral con los tiempos por etapa de la sesión."""
+
+    @staticmethod
+    def trace() -> Optional[Trace]:
+        """Traza de la sesión si el usuario activó el diagnóstico; None en caso contrario."""
+        if not st.sidebar.toggle("Diagnóstico de rendimiento", key="diagnostics_enabled"):
+            return None
+        trace = st.session_state.setdefault('trace', Trace())
+        memory = st.sidebar.checkbox(
+            "Medir pico de memoria (más lento)", value=trace.measure_memory)
+        if memory != trace.measure_memory:
+            set_memory_tracking(trace, memory)
+        return trace
+
+    @staticmethod
+    def render(trace: Trace) -> None:
+        """Muestra los totales por etapa y permite descargar la traza completa."""
+        with st.sidebar.expander("Tiempos por etapa", expanded=True):
+            timings = st.session_state.get('run_timings')
+            if timings:
+                st.caption(
+                    f"Último rerun: {timings['total_s']:.2f} s · página lista para dibujarse "
+                    f"a los {timings['page_ready_s']:.2f} s · importación de la página "
+                    f"{timings['import_s']:.2f} s")
+            if startup_times:
+                st.caption("Arranque del proceso: " + " · ".join(
+                    f"{name} {seconds:.2f} s" for name, seconds in startup_times.items()))
+            summary = trace.summary()
+            if summary.empty:
+                st.caption("Aún no hay llamadas registradas.")
+                return
+            st.dataframe(summary.style.format({
+                'wall_s': '{:.3f}', 'thread_cpu_s': '{:.3f}', 'peak_mb': '{:.1f}',
+                'rows': '{:,.0f}'
+            }, na_rep="–"))
+            st.caption("CPU y memoria sólo del hilo y el proceso de la app: no incluyen "
+                       "los trabajadores de joblib ni los hilos BLAS de los ajustes en "
+                       "paralelo.")
+            st.download_button(
+                "Descargar traza (JSON)",
+                data=json.dumps(trace.to_chrome_trace()),
+                file_name="traza_segmentacion.json",
+                mime="application/json",
+                help="Formato Trace Event: se abre en chrome://tracing o ui.perfetto.dev"
+            )
+            if st.button("Limpiar traza"):
+                trace.clear()
+                st.rerun()
+
+
 def main() -> None:
     """Función principal de la aplicación."""
+    script_start = time.perf_counter()
     st.set_page_config(**config.PAGE_CONFIG)
     set_custom_styles()
     st.title(config.TITLE)
@@ -30,19 +112,31 @@ def main() -> None:
     if 'selected_page' not in st.session_state:
         st.session_state.selected_page = "Carga de datos"
 
-    PAGES = {
-        "Carga de datos": cargar_datos,
-        "Clustering": generar_cluster,
-        "Visualización": vizualizacion,
-        "Demográficos": add_demografico,
-    }
-
     st.sidebar.title("Navegación")
     for page_name in PAGES:
         if st.sidebar.button(page_name):
             st.session_state.selected_page = page_name
 
-    PAGES[st.session_state.selected_page].show()
+    job = st.session_state.get('clustering_job')
+    if job is not None and job.running:
+        st.sidebar.progress(job.progress, text="Clustering en segundo plano")
+
+    trace = DiagnosticsPanel.trace()
+    with tracing(trace):
+        page, import_s = load_page(PAGES[st.session_state.selected_page])
+        # Fin de la barra lateral y de la importación, antes del primer elemento de la página
+        page_ready_s = time.perf_counter() - script_start
+        page.show()
+    timings = {
+        'import_s': import_s,
+        'page_ready_s': page_ready_s,
+        'total_s': time.perf_counter() - script_start,
+    }
+    st.session_state['run_timings'] = timings
+    # El primer rerun del proceso es el arranque en frío
+    record_startup("primer rerun", timings['total_s'])
+    if trace is not None:
+        DiagnosticsPanel.render(trace)
 
 
 if __name__ == "__main__":
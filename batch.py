@@ -0,0 +1,295 @@
+"""
+Pipeline de segmentación por lotes, sin Streamlit.
+
+Ejecuta carga → limpieza → clustering → selección de k → merge demográfico → exportación
+a partir de un archivo de configuración JSON y guarda los resultados y los tiempos
+de cada etapa en el directorio de salida.
+
+Uso:
+    python batch.py configuracion.json [--output salida/] [--n-jobs 8] [--trace]
+"""
+
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.cache import get_model_cache
+from data.join import KeyIndex, indexed_join
+from data.loader import DataLoader
+from utils.cleaning import DataCleaner, StreamingDataCleaner
+from utils.clustering import (
+    STRATEGIES, AdaptiveKSearch, MiniBatchKMeansClustering, ClusteringMetrics,
+    chunked_labels, fit_encoder, iter_array_chunks, model_labels, run_lda_range
+)
+from utils.jobs import ClusteringJob
+from utils.export import ExcelExporter
+from utils.profiling import Trace, set_memory_tracking, tracing
+from utils.scoring import SegmentationArtifact
+import config
+
+DEFAULTS: Dict[str, Any] = {
+    "method": "GMM",
+    "vars": [],
+    "cat_vars": [],
+    "k_min": 2,
+    "k_max": 10,
+    "k": None,
+    "adaptive": False,
+    "demographics": None,
+    "output_dir": "salida",
+    "n_jobs": config.CLUSTERING_N_JOBS,
+    "silhouette_sample_size": config.SILHOUETTE_SAMPLE_SIZE,
+    "dtype": config.NUMERIC_DTYPE,
+    "streaming": False,
+    "chunksize": 100_000,
+    "use_cache": True,
+    "excel": True,
+}
+
+
+class BatchPipeline:
+    """
+    Ejecuta el flujo completo de la app con los mismos componentes que las páginas.
+
+    Configuración (JSON):
+        data: ruta del CSV principal.
+        id_col: columna identificadora.
+        method: "GMM", "K-Means", "Mini-Batch K-Means" o "LDA".
+        vars / cat_vars: variables numéricas (GMM/K-Means) o categóricas (LDA).
+        k_min, k_max: rango de k a evaluar.
+        k: número de clusters final; si es null se elige como en la página (codo del
+            BIC en GMM, del Silhouette en K-Means, menor perplejidad en LDA).
+        adaptive: en GMM/K-Means, búsqueda adaptativa de k (rejilla gruesa, parada por
+            meseta y refinamiento); si k es null se usa el k que propone.
+        demographics: {"data": ruta, "id_col": columna, "vars": [...]} opcional.
+        dtype: "float64" o "float32" para la matriz numérica limpia.
+        streaming: en GMM/K-Means, limpia el CSV por bloques de `chunksize` filas en un
+            `.npy` mapeado en memoria (`datos_limpios.npy`) en lugar de cargarlo entero;
+            sólo la columna identificadora se lee completa. Mini-Batch K-Means se ajusta
+            entonces con `partial_fit` recorriendo el `.npy` por bloques.
+        output_dir, n_jobs, silhouette_sample_size, use_cache, excel.
+    """
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = {**DEFAULTS, **settings}
+        for key in ("data", "id_col"):
+            if not self.settings.get(key):
+                raise ValueError(f"Falta '{key}' en la configuración.")
+        method = self.settings["method"]
+        if method not in STRATEGIES and method != "LDA":
+            raise ValueError(f"Método desconocido: {method}")
+        if not self.settings["cat_vars" if method == "LDA" else "vars"]:
+            raise ValueError(f"El método {method} necesita al menos una variable.")
+        self.cache = get_model_cache() if self.settings["use_cache"] else None
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mide el tiempo de pared de una etapa."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            print(f"[{name}] {self.timings[name]:.2f} s", flush=True)
+
+    def _select_k(self, metrics: pd.DataFrame) -> int:
+        """k fijado en la configuración o el que propone la página con el mismo criterio."""
+        if self.settings["k"] is not None:
+            return int(self.settings["k"])
+        if self.settings["method"] == "LDA":
+            return int(metrics.loc[metrics['Perplexity'].idxmin(), 'k'])
+        strategy = STRATEGIES[self.settings["method"]]()
+        return AdaptiveKSearch.best_k(metrics, AdaptiveKSearch.criterion_for(strategy))
+
+    def _search_numeric(self, X: Any) -> tuple:
+        s = self.settings
+        strategy = STRATEGIES[s["method"]]()
+        search = AdaptiveKSearch(
+            s["k_min"], s["k_max"], AdaptiveKSearch.criterion_for(strategy))
+        with self.stage("busqueda_k"):
+            job = ClusteringJob(
+                strategy, X, range(s["k_min"], s["k_max"] + 1),
+                sample_size=s["silhouette_sample_size"], n_jobs=s["n_jobs"],
+                cache=self.cache, search=search).run()
+        if job.status == ClusteringJob.FAILED:
+            raise RuntimeError(job.error)
+        models, metrics = job.snapshot()
+        k = int(s["k"]) if s["k"] is not None else job.optimal_k
+        with self.stage("asignacion"):
+            model = models.get(k) or strategy.fit(X, k)
+            if s["streaming"]:
+                labels = chunked_labels(model, X, s["chunksize"])
+            else:
+                labels = model_labels(model, X)
+        return k, labels, metrics, model
+
+    def _load_streaming(self) -> tuple:
+        """IDs y matriz limpia mapeada en memoria, leyendo el CSV por bloques."""
+        s = self.settings
+        with self.stage("carga"):
+            ids = pd.read_csv(s["data"], usecols=[s["id_col"]])
+        with self.stage("limpieza"):
+            cleaner = StreamingDataCleaner(chunksize=s["chunksize"], dtype=s["dtype"])
+            X = cleaner.clean_csv(
+                s["data"], s["vars"], os.path.join(s["output_dir"], "datos_limpios.npy"))
+        return ids, X, cleaner
+
+    def _cluster_numeric(self, X: Any) -> tuple:
+        s = self.settings
+        if s["adaptive"]:
+            return self._search_numeric(X)
+        strategy = STRATEGIES[s["method"]]()
+        # En streaming, Mini-Batch K-Means recorre el .npy por bloques con partial_fit
+        by_chunks = s["streaming"] and isinstance(strategy, MiniBatchKMeansClustering)
+        with self.stage("clustering"):
+            if by_chunks:
+                models = strategy.fit_range_chunks(
+                    lambda: iter_array_chunks(X, s["chunksize"]), s["k_min"], s["k_max"])
+            else:
+                models = strategy.fit_range(
+                    X, s["k_min"], s["k_max"], n_jobs=s["n_jobs"], cache=self.cache)
+        with self.stage("metricas"):
+            metrics = ClusteringMetrics.compute_all(
+                models, X, sample_size=s["silhouette_sample_size"], cache=self.cache)
+        k = self._select_k(metrics)
+        with self.stage("asignacion"):
+            if s["streaming"]:
+                labels = chunked_labels(models[k], X, s["chunksize"])
+            else:
+                labels = model_labels(models[k], X)
+        return k, labels, metrics, models[k]
+
+    def _cluster_lda(self, df: pd.DataFrame) -> tuple:
+        s = self.settings
+        with self.stage("clustering"):
+            models, X = run_lda_range(
+                df, s["cat_vars"], s["k_min"], s["k_max"],
+                n_jobs=s["n_jobs"], cache=self.cache)
+        with self.stage("metricas"):
+            metrics = ClusteringMetrics.compute_lda_metrics(models, X)
+        k = self._select_k(metrics)
+        with self.stage("asignacion"):
+            labels = np.argmax(models[k].transform(X), axis=1)
+        return k, labels, metrics, models[k]
+
+    def _merge(self, assignments: pd.DataFrame) -> Optional[pd.DataFrame]:
+        demo = self.settings["demographics"]
+        if not demo:
+            return None
+        with self.stage("carga_demograficos"):
+            df_demo = DataLoader.load_path(demo["data"])
+        with self.stage("merge"):
+            index = KeyIndex(df_demo[demo["id_col"]])
+            merged, stats = indexed_join(
+                assignments, self.settings["id_col"], df_demo, index, demo["vars"])
+        print(f"[merge] {json.dumps(stats)}", flush=True)
+        return merged
+
+    def run(self) -> Dict[str, Any]:
+        """Ejecuta todas las etapas y escribe los resultados en `output_dir`."""
+        s = self.settings
+        out_dir = s["output_dir"]
+        os.makedirs(out_dir, exist_ok=True)
+        total_start = time.perf_counter()
+
+        if s["method"] == "LDA":
+            with self.stage("carga"):
+                df = DataLoader.load_path(s["data"])
+            k, labels, metrics, model = self._cluster_lda(df)
+            used = s["cat_vars"]
+            assignments = df[[s["id_col"]] + used].copy()
+            artifact = SegmentationArtifact(
+                "LDA", used, model, encoder=fit_encoder(df, used), id_col=s["id_col"])
+        elif s["streaming"]:
+            used = s["vars"]
+            ids, X, cleaner = self._load_streaming()
+            k, labels, metrics, model = self._cluster_numeric(X)
+            assignments = ids
+            artifact = SegmentationArtifact.from_cleaner(
+                s["method"], model, cleaner, id_col=s["id_col"])
+        else:
+            used = s["vars"]
+            with self.stage("carga"):
+                df = DataLoader.load_path(s["data"])
+            with self.stage("limpieza"):
+                cleaner = DataCleaner(dtype=s["dtype"])
+                X = cleaner.clean(df[used])
+            k, labels, metrics, model = self._cluster_numeric(X)
+            assignments = pd.concat([df[[s["id_col"]]], X], axis=1)
+            artifact = SegmentationArtifact.from_cleaner(
+                s["method"], model, cleaner, id_col=s["id_col"])
+        assignments['cluster'] = labels
+
+        merged = self._merge(assignments)
+        result = merged if merged is not None else assignments
+        demo_vars = s["demographics"]["vars"] if s["demographics"] else []
+
+        with self.stage("exportacion"):
+            assignments[[s["id_col"], 'cluster']].to_csv(
+                os.path.join(out_dir, "asignaciones.csv"), index=False)
+            metrics.to_csv(os.path.join(out_dir, "metricas.csv"), index=False)
+            artifact.save(os.path.join(out_dir, "modelo.joblib"))
+            if merged is not None:
+                merged.to_csv(os.path.join(out_dir, "merge.csv"), index=False)
+            if s["excel"]:
+                if len(result) < ExcelExporter.MAX_ROWS:
+                    ExcelExporter(result, demo_vars, id_col=s["id_col"]).write(
+                        os.path.join(out_dir, "segmentacion.xlsx"))
+                else:
+                    print(f"[exportacion] {len(result):,} filas superan el límite de Excel; "
+                          "se omite segmentacion.xlsx (los CSV contienen todos los datos).")
+
+        self.timings["total"] = time.perf_counter() - total_start
+        summary = {
+            "method": s["method"],
+            "k": k,
+            "rows": len(assignments),
+            "variables": used,
+            "timings": self.timings,
+        }
+        with open(os.path.join(out_dir, "resumen.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Segmentación por lotes sin interfaz.")
+    parser.add_argument("config", help="Archivo JSON de configuración")
+    parser.add_argument("--output", help="Directorio de salida (sobrescribe output_dir)")
+    parser.add_argument("--n-jobs", type=int, help="Núcleos a usar (-1 = todos)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Guarda traza.json con cada llamada instrumentada (formato Trace Event)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Incluye el pico de memoria en la traza (más lento)")
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding="utf-8") as f:
+        settings = json.load(f)
+    if args.output:
+        settings["output_dir"] = args.output
+    if args.n_jobs is not None:
+        settings["n_jobs"] = args.n_jobs
+    trace = Trace() if args.trace or args.trace_memory else None
+    if trace is not None and args.trace_memory:
+        set_memory_tracking(trace, True)
+    pipeline = BatchPipeline(settings)
+    with tracing(trace):
+        summary = pipeline.run()
+    if trace is not None:
+        path = os.path.join(pipeline.settings["output_dir"], "traza.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace.to_chrome_trace(), f)
+        print(trace.summary().to_string())
+    print(f"Segmentación terminada con k={summary['k']} "
+          f"en {summary['timings']['total']:.2f} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmarks de escalado del pipeline de segmentación.
+
+Mide el tiempo y el pico de memoria (tracemalloc) de cada etapa sobre datasets
+sintéticos de distintos tamaños y guarda los resultados en JSON para comparar
+versiones.
+
+Uso:
+    python -m benchmarks.run --rows 10000 100000 --out resultados.json
+    python -m benchmarks.run --rows 100000 --compare resultados_anteriores.json
+    python -m benchmarks.run --rows 1000000 --dtype float32
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic import make_customers
+from utils.cleaning import DataCleaner
+from utils.clustering import (
+    compute_aic_bic, compute_all_metrics, compute_silhouette, model_labels, run_gmm,
+    run_kmeans, run_lda_segmentation
+)
+from utils.export import ExcelExporter
+from utils.plots import ClusterPlotter, ProjectionService
+
+
+class BenchmarkRunner:
+    """Ejecuta cada etapa `repeat` veces para medir tiempo y una vez más bajo tracemalloc."""
+
+    def __init__(self, repeat: int = 3):
+        self.repeat = repeat
+        self.results: List[Dict[str, Any]] = []
+
+    def measure(self, stage: str, params: Dict[str, Any], func: Callable[[], Any],
+                reset: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Mide una etapa y devuelve el resultado de su última ejecución.
+
+        Args:
+            stage (str): Nombre de la etapa.
+            params (Dict[str, Any]): Parámetros del dataset, se copian en el resultado.
+            func (Callable): Función sin argumentos que ejecuta la etapa.
+            reset (Callable, optional): Limpia cachés en memoria antes de cada ejecución.
+        """
+        times = []
+        result = None
+        for _ in range(self.repeat):
+            if reset:
+                reset()
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+
+        if reset:
+            reset()
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        row = {
+            **params,
+            "stage": stage,
+            "seconds_min": min(times),
+            "seconds_median": statistics.median(times),
+            "peak_mb": peak / 1024 ** 2,
+        }
+        self.results.append(row)
+        print(f"{stage:<44} {params['rows']:>10,} filas  "
+              f"{row['seconds_min']:8.3f} s  {row['peak_mb']:9.1f} MB", flush=True)
+        return result
+
+
+def _clear_projections() -> None:
+    with ProjectionService._lock:
+        ProjectionService._cache.clear()
+
+
+def run_suite(runner: BenchmarkRunner, rows: int, features: int, categorical: int,
+              cardinality: int, clusters: int, n_jobs: int, sample_size: int,
+              dtype: str = "float64") -> None:
+    """Mide todas las etapas sobre un dataset sintético de `rows` filas."""
+    params = {"rows": rows, "features": features, "categorical": categorical,
+              "cardinality": cardinality, "clusters": clusters, "n_jobs": n_jobs,
+              "dtype": dtype}
+    dataset = make_customers(rows, features, categorical, cardinality, clusters)
+    df, numeric_vars, cat_vars = dataset.df, dataset.numeric_vars, dataset.cat_vars
+    k_min, k_max = 2, clusters + 2
+
+    X = runner.measure("DataCleaner.clean", params,
+                       lambda: DataCleaner(dtype=dtype).clean(df[numeric_vars]))
+    gmm = runner.measure("run_gmm", params,
+                         lambda: run_gmm(X, k_min, k_max, n_jobs=n_jobs))
+    kmeans = runner.measure("run_kmeans", params,
+                            lambda: run_kmeans(X, k_min, k_max, n_jobs=n_jobs))
+    if cat_vars:
+        runner.measure(
+            "run_lda_segmentation", params,
+            lambda: run_lda_segmentation(df, cat_vars, n_segments=clusters, n_jobs=n_jobs))
+    runner.measure("compute_aic_bic", params, lambda: compute_aic_bic(gmm, X))
+    runner.measure("compute_silhouette", params,
+                   lambda: compute_silhouette(kmeans, X, sample_size=sample_size))
+    runner.measure("compute_all_metrics", params,
+                   lambda: compute_all_metrics(gmm, X, sample_size=sample_size))
+
+    model = gmm[clusters]
+    merged = pd.concat([df[[dataset.id_col] + cat_vars], X], axis=1)
+    merged["cluster"] = model_labels(model, X)
+    figures = {
+        "ClusterPlotter.membership_heatmap":
+            lambda: ClusterPlotter.membership_heatmap(model, numeric_vars),
+        "ClusterPlotter.dimensionality_reduction":
+            lambda: ClusterPlotter.dimensionality_reduction(X, model),
+        "ClusterPlotter.dimensionality_reduction_3d":
+            lambda: ClusterPlotter.dimensionality_reduction_3d(X, model),
+        "ClusterPlotter.countplot":
+            lambda: ClusterPlotter.countplot(merged, "cluster"),
+        "ClusterPlotter.boxplot":
+            lambda: ClusterPlotter.boxplot(merged, numeric_vars[0], "cluster"),
+    }
+    if cat_vars:
+        figures.update({
+            "ClusterPlotter.heatmap":
+                lambda: ClusterPlotter.heatmap(merged, "cluster", cat_vars[0]),
+            "ClusterPlotter.radar_chart":
+                lambda: ClusterPlotter.radar_chart(merged, "cluster", cat_vars),
+            "ClusterPlotter.bar_chart":
+                lambda: ClusterPlotter.bar_chart(merged, cat_vars[0], "cluster"),
+        })
+    for stage, func in figures.items():
+        runner.measure(stage, params, func, reset=_clear_projections)
+
+    if len(merged) < ExcelExporter.MAX_ROWS:
+        exporter = ExcelExporter(merged, cat_vars, id_col=dataset.id_col)
+        runner.measure("ExcelExporter.to_excel_bytes", params, exporter.to_excel_bytes)
+
+
+def environment() -> Dict[str, Any]:
+    """Versiones y máquina, para interpretar las comparaciones entre ejecuciones."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Imprime la razón de tiempos y memoria frente a una ejecución anterior."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    key = lambda r: (r["stage"], r["rows"], r["features"], r["categorical"],
+                     r["cardinality"], r["clusters"], r.get("dtype", "float64"))
+    previous = {key(r): r for r in baseline}
+    print(f"\nComparación con {baseline_path} (razón actual / anterior):")
+    for row in results:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        print(f"{row['stage']:<44} {row['rows']:>10,} filas  "
+              f"tiempo x{row['seconds_min'] / max(old['seconds_min'], 1e-9):5.2f}  "
+              f"memoria x{row['peak_mb'] / max(old['peak_mb'], 1e-9):5.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks de escalado del pipeline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--categorical", type=int, default=2)
+    parser.add_argument("--cardinality", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=4)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--silhouette-sample-size", type=int, default=20_000)
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64",
+                        help="Precisión de la matriz numérica limpia")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    runner = BenchmarkRunner(repeat=args.repeat)
+    for rows in args.rows:
+        run_suite(runner, rows, args.features, args.categorical, args.cardinality,
+                  args.clusters, args.n_jobs, args.silhouette_sample_size, args.dtype)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": runner.results}, f, indent=2)
+    print(f"\nResultados guardados en {args.out}")
+    if args.compare:
+        compare(runner.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Tiempo de arranque de la app: importación de cada página en un proceso nuevo.
+
+Cada medición se hace en un intérprete limpio (sin módulos en caché), que es lo que
+paga el primer usuario tras reiniciar el servidor.
+
+Uso:
+    python -m benchmarks.startup --repeat 5 --out arranque.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Módulos que app.py importa al arrancar y módulos de cada página
+MODULES: List[str] = [
+    "streamlit",
+    "utils.profiling",
+    "pages_app.cargar_datos",
+    "pages_app.generar_cluster",
+    "pages_app.vizualizacion",
+    "pages_app.add_demografico",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SNIPPET = (
+    "import time\n"
+    "{preload}"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def import_time(module: str) -> float:
+    """Segundos para importar `module` en un intérprete nuevo (streamlit ya cargado)."""
+    preload = "" if module == "streamlit" else "import streamlit\n"
+    snippet = _SNIPPET.format(preload=preload, module=module)
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío de cada página.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="startup_results.json")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for module in MODULES:
+        times = [import_time(module) for _ in range(args.repeat)]
+        results[module] = {"seconds_min": min(times), "seconds_median": statistics.median(times)}
+        print(f"{module:<28} {results[module]['seconds_median']:.3f} s", flush=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+    print(f"\nResultados guardados en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
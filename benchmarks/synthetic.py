@@ -0,0 +1,132 @@
+"""
+Generador de clientes sintéticos con la forma de `example_data/marketing_campaign.csv`.
+
+Uso:
+    python -m benchmarks.synthetic --rows 1000000 --out clientes.csv
+"""
+
+import argparse
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# Columnas numéricas del dataset real, en el orden en que se generan
+NUMERIC_COLUMNS: List[str] = [
+    "Income", "Recency", "MntWines", "MntFruits", "MntMeatProducts", "MntFishProducts",
+    "MntSweetProducts", "MntGoldProds", "NumDealsPurchases", "NumWebPurchases",
+    "NumCatalogPurchases", "NumStorePurchases", "NumWebVisitsMonth",
+]
+# Columnas categóricas del dataset real y sus valores
+CATEGORICAL_VALUES = {
+    "Education": ["Graduation", "PhD", "Master", "2n Cycle", "Basic"],
+    "Marital_Status": ["Married", "Together", "Single", "Divorced", "Widow",
+                       "Alone", "Absurd", "YOLO"],
+}
+
+
+class SyntheticDataset:
+    """Dataset sintético con sus columnas por tipo y los clusters verdaderos."""
+
+    def __init__(self, df: pd.DataFrame, id_col: str, numeric_vars: List[str],
+                 cat_vars: List[str], labels: np.ndarray):
+        self.df = df
+        self.id_col = id_col
+        self.numeric_vars = numeric_vars
+        self.cat_vars = cat_vars
+        self.labels = labels
+
+
+def _numeric_column(name: str, z: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Lleva una variable latente normal a la escala de la columna real."""
+    if name == "Income":
+        return np.round(52_000 * np.exp(0.35 * z))
+    if name == "Recency":
+        return np.clip(np.round(50 + 25 * z), 0, 99)
+    if name.startswith("Mnt"):
+        return np.round(np.expm1(4 + 1.2 * z).clip(min=0))
+    if name.startswith("Num"):
+        return rng.poisson(np.exp(1.5 + 0.4 * z)).astype(np.float64)
+    return z
+
+
+def make_customers(
+    n_rows: int = 10_000,
+    n_features: int = 8,
+    n_categorical: int = 2,
+    cardinality: int = 5,
+    n_clusters: int = 4,
+    cluster_std: float = 1.0,
+    missing_rate: float = 0.01,
+    random_state: int = 0
+) -> SyntheticDataset:
+    """
+    Genera clientes agrupados en `n_clusters` segmentos verdaderos.
+
+    Args:
+        n_rows (int): Número de clientes.
+        n_features (int): Variables numéricas; las primeras usan los nombres del dataset
+            real y las siguientes se llaman `Feature_<i>`.
+        n_categorical (int): Variables categóricas (Education, Marital_Status, `Cat_<i>`).
+        cardinality (int): Valores distintos de cada variable categórica.
+        n_clusters (int): Número de segmentos verdaderos.
+        cluster_std (float): Dispersión dentro de cada segmento, relativa a la separación
+            entre centros (1 = segmentos que se solapan moderadamente).
+        missing_rate (float): Fracción de valores faltantes en Income, como en el dataset real.
+        random_state (int): Semilla.
+
+    Returns:
+        SyntheticDataset: DataFrame con columna `ID`, variables y etiquetas verdaderas.
+    """
+    rng = np.random.default_rng(random_state)
+    labels = rng.integers(0, n_clusters, size=n_rows)
+    centers = rng.normal(0, 1, size=(n_clusters, n_features))
+    latent = centers[labels] + rng.normal(0, cluster_std / 3, size=(n_rows, n_features))
+
+    data = {"ID": rng.permutation(n_rows) + 1000}
+    numeric_vars = [
+        NUMERIC_COLUMNS[i] if i < len(NUMERIC_COLUMNS) else f"Feature_{i}"
+        for i in range(n_features)
+    ]
+    for i, name in enumerate(numeric_vars):
+        data[name] = _numeric_column(name, latent[:, i], rng)
+    if "Income" in data and missing_rate > 0:
+        data["Income"][rng.random(n_rows) < missing_rate] = np.nan
+
+    cat_vars = []
+    known = list(CATEGORICAL_VALUES)
+    for i in range(n_categorical):
+        name = known[i] if i < len(known) else f"Cat_{i}"
+        values = CATEGORICAL_VALUES.get(name, [])
+        if cardinality > len(values):
+            values = [f"{name}_{j}" for j in range(cardinality)]
+        values = np.asarray(values[:cardinality], dtype=object)
+        # Cada segmento tiene su propia distribución sobre los valores
+        probs = rng.dirichlet(np.full(cardinality, 0.5), size=n_clusters)
+        cumulative = probs.cumsum(axis=1)[labels]
+        codes = (rng.random((n_rows, 1)) > cumulative).sum(axis=1)
+        data[name] = values[np.minimum(codes, cardinality - 1)]
+        cat_vars.append(name)
+
+    df = pd.DataFrame(data)
+    return SyntheticDataset(df, "ID", numeric_vars, cat_vars, labels)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera un CSV de clientes sintéticos.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--categorical", type=int, default=2)
+    parser.add_argument("--cardinality", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="Ruta del CSV de salida")
+    args = parser.parse_args()
+    dataset = make_customers(args.rows, args.features, args.categorical,
+                             args.cardinality, args.clusters, random_state=args.seed)
+    dataset.df.to_csv(args.out, index=False)
+    print(f"{len(dataset.df):,} filas escritas en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,36 @@
 """Configuración global de la aplicación."""
 
+import os
+
 PAGE_CONFIG: dict = {
     "page_title": "Dashboard de Segmentación",
     "layout": "wide",
     "page_icon": "📊"
 }
 TITLE: str = "Dashboard Dinámico de Segmentación"
+
+# Directorio raíz de las cachés en disco (puede sobrescribirse por entorno)
+CACHE_DIR: str = os.environ.get("SEGMENTATION_CACHE_DIR", ".cache")
+# Tamaño máximo de la caché de datasets cargados antes de desalojar (LRU)
+DATASET_CACHE_MAX_BYTES: int = 20 * 1024 ** 3
+# Tamaño máximo de la caché de modelos y métricas antes de desalojar (LRU)
+MODEL_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+# Tamaño máximo de la caché de archivos Excel exportados antes de desalojar (LRU)
+EXPORT_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+# Memoria máxima por sesión para datos; el exceso se vuelca a disco
+SESSION_MEMORY_BUDGET_BYTES: int = int(
+    os.environ.get("SEGMENTATION_SESSION_BUDGET", 2 * 1024 ** 3))
+# Trabajadores para ajustar el rango de k en paralelo (-1 = todos los núcleos)
+CLUSTERING_N_JOBS: int = int(os.environ.get("SEGMENTATION_N_JOBS", -1))
+# Filas a partir de las cuales el Silhouette se estima por muestreo (None = exacto)
+SILHOUETTE_SAMPLE_SIZE: int = 20_000
+# Precisión de la matriz numérica limpia: "float64" o "float32" (mitad de memoria)
+NUMERIC_DTYPE: str = os.environ.get("SEGMENTATION_DTYPE", "float64")
+# Filas por bloque al asignar clientes nuevos con un modelo guardado
+SCORING_CHUNKSIZE: int = int(os.environ.get("SEGMENTATION_SCORING_CHUNKSIZE", 200_000))
+# Réplicas por k del análisis de estabilidad por remuestreo
+STABILITY_REPLICATES: int = 20
+# Filas máximas de cada réplica del análisis de estabilidad
+STABILITY_SAMPLE_SIZE: int = 10_000
+# Vecinos a cada lado del k propuesto que se analizan por defecto
+STABILITY_NEIGHBOURS: int = 1
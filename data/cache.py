@@ -0,0 +1,198 @@
+"""Cachés en disco con desalojo LRU acotado por tamaño."""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import config
+
+# joblib y scikit-learn se importan en `ModelCache` y scipy en `frame_fingerprint`: la
+# página de carga usa la caché de datasets de este módulo y no necesita ninguno.
+
+
+class LRUDiskCache:
+    """Directorio de archivos con desalojo LRU según un tamaño máximo en bytes.
+
+    La fecha de modificación de cada archivo se usa como marca de último acceso.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str, suffix: str = "") -> Path:
+        """Ruta del archivo asociado a una clave."""
+        return self.directory / f"{key}{suffix}"
+
+    def touch(self, path: Path) -> None:
+        """Marca un archivo como usado recientemente."""
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Elimina los archivos menos usados hasta respetar `max_bytes`."""
+        with self._lock:
+            entries = []
+            for path in self.directory.iterdir():
+                if not path.is_file() or path.suffix == ".tmp":
+                    continue
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and path == keep:
+                    continue
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+def hash_file(fileobj: BinaryIO, chunk_size: int = 16 * 1024 ** 2) -> str:
+    """Calcula el hash del contenido de un archivo sin cargarlo entero en memoria."""
+    digest = hashlib.blake2b(digest_size=16)
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df: Any) -> str:
+    """Hash del contenido de un DataFrame, arreglo o matriz dispersa (valores y tipos)."""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(df, pd.DataFrame):
+        digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+    import scipy.sparse as sp
+
+    if sp.issparse(df):
+        csr = sp.csr_matrix(df)
+        digest.update(repr((csr.dtype.str, csr.shape)).encode())
+        for part in (csr.data, csr.indices, csr.indptr):
+            digest.update(memoryview(np.ascontiguousarray(part)).cast("B"))
+    else:
+        array = np.ascontiguousarray(df)
+        digest.update(repr((array.dtype.str, array.shape)).encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def optimize_dtypes(df: pd.DataFrame, max_category_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Reduce el tamaño en memoria de un DataFrame.
+
+    Los enteros se reducen al menor tipo que los contiene, los flotantes pasan a
+    float32 sólo si no se pierde precisión y las columnas de texto con pocos
+    valores distintos se convierten a categóricas.
+    """
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            reduced = series.astype(np.float32)
+            if np.array_equal(reduced.to_numpy(np.float64), series.to_numpy(np.float64), equal_nan=True):
+                series = reduced
+        elif series.dtype == object:
+            if series.nunique(dropna=True) <= max_category_ratio * len(series):
+                series = series.astype("category")
+        out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+class DatasetCache(LRUDiskCache):
+    """Caché de CSV convertidos a Arrow (Feather sin comprimir) por hash de contenido."""
+
+    SUFFIX = ".arrow"
+
+    def load(self, fileobj: BinaryIO, key: Optional[str] = None) -> pd.DataFrame:
+        """
+        Devuelve el contenido del CSV, convirtiéndolo a Arrow sólo la primera vez.
+
+        Args:
+            fileobj: archivo CSV abierto en modo binario.
+            key: hash del contenido si ya se conoce.
+        Returns:
+            DataFrame leído desde la copia en disco mapeada en memoria.
+        """
+        key = key or hash_file(fileobj)
+        path = self.path_for(key, self.SUFFIX)
+        if not path.exists():
+            df = optimize_dtypes(pd.read_csv(fileobj))
+            tmp = self.path_for(f"{key}.{os.getpid()}.{threading.get_ident()}", ".tmp")
+            feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+            os.replace(tmp, path)
+            self.evict(keep=path)
+        self.touch(path)
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+class ModelCache(LRUDiskCache):
+    """Caché de modelos y métricas serializados con joblib."""
+
+    SUFFIX = ".joblib"
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Clave estable a partir de la huella de los datos y los hiperparámetros."""
+        import sklearn
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((sklearn.__version__,) + parts).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        import joblib
+
+        path = self.path_for(key, self.SUFFIX)
+        try:
+            value = joblib.load(path)
+        except (FileNotFoundError, EOFError):
+            return None
+        self.touch(path)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        import joblib
+
+        path = self.path_for(key, self.SUFFIX)
+        tmp = self.path_for(f"{key}.{os.getpid()}.{threading.get_ident()}", ".tmp")
+        joblib.dump(value, tmp)
+        os.replace(tmp, path)
+        self.evict(keep=path)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """Devuelve la caché de modelos compartida entre sesiones."""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = ModelCache(
+            os.path.join(config.CACHE_DIR, "models"), config.MODEL_CACHE_MAX_BYTES)
+    return _model_cache
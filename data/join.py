@@ -0,0 +1,150 @@
+"""Unión indexada de datasets por identificador."""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _integer_uniques(uniques: pd.Series) -> Optional[np.ndarray]:
+    """Valores únicos como int64 si todos son enteros sin pérdida; None en caso contrario."""
+    if pd.api.types.is_bool_dtype(uniques):
+        return None
+    if pd.api.types.is_integer_dtype(uniques):
+        return uniques.to_numpy(dtype=np.int64)
+    numeric = pd.to_numeric(uniques, errors='coerce')
+    if numeric.isna().any() or not (numeric % 1 == 0).all():
+        return None
+    integers = numeric.to_numpy(dtype=np.int64)
+    if not pd.api.types.is_numeric_dtype(uniques):
+        # Texto como "007" no es el mismo identificador que 7
+        if not (pd.Series(integers).astype(str).to_numpy() == uniques.astype(str).to_numpy()).all():
+            return None
+    return integers
+
+
+def _string_uniques(uniques: pd.Series) -> np.ndarray:
+    """Valores únicos como texto; los decimales enteros (1.0) se escriben como enteros."""
+    if pd.api.types.is_float_dtype(uniques) and (uniques % 1 == 0).all():
+        uniques = uniques.astype(np.int64)
+    return uniques.astype(str).to_numpy(dtype=object)
+
+
+def _remap(mapping: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Aplica `mapping` a códigos de factorización conservando -1 para los faltantes."""
+    return np.append(mapping, -1)[codes]
+
+
+def factorize_keys(keys: pd.Series, kind: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Codifica una columna de identificadores en códigos enteros compactos.
+
+    La conversión a entero o a texto se aplica sólo a los valores únicos, nunca fila a fila.
+
+    Args:
+        keys (pd.Series): Columna de identificadores.
+        kind (str, optional): "int" o "str" para forzar el tipo de clave; si es None se
+            usa "int" cuando todos los valores son enteros.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, str]: Código por fila (-1 si falta), claves únicas
+        normalizadas y tipo de clave usado.
+    """
+    codes, uniques = pd.factorize(keys)
+    uniques = pd.Series(np.asarray(uniques))
+    normalized = _integer_uniques(uniques) if kind in (None, "int") else None
+    if normalized is not None:
+        kind = "int"
+    elif kind == "int":
+        # Los valores no enteros no pueden coincidir con un índice de enteros
+        numeric = pd.to_numeric(uniques, errors='coerce')
+        remap, normalized = pd.factorize(numeric.where(numeric % 1 == 0))
+        codes = _remap(remap, codes)
+        return codes, np.asarray(normalized, dtype=np.int64), kind
+    else:
+        kind = "str"
+        normalized = _string_uniques(uniques)
+    # Valores distintos pueden coincidir tras normalizar (p. ej. 1 y "1")
+    remap, normalized = pd.factorize(normalized)
+    codes = _remap(remap, codes)
+    return codes, np.asarray(normalized), kind
+
+
+class KeyIndex:
+    """
+    Índice hash sobre la columna identificadora de un dataset.
+
+    Guarda, para cada identificador distinto, la posición de su primera fila; los
+    identificadores repetidos se cuentan pero sólo se usa su primera aparición.
+    """
+
+    def __init__(self, keys: pd.Series):
+        codes, uniques, self.kind = factorize_keys(keys)
+        valid = codes >= 0
+        self.n_rows = len(codes)
+        self.n_missing_keys = int((~valid).sum())
+        self.index = pd.Index(uniques)
+        self.first_position = np.empty(len(uniques), dtype=np.int64)
+        # Al escribir en orden inverso queda la primera aparición de cada clave
+        positions = np.flatnonzero(valid)[::-1]
+        self.first_position[codes[positions]] = positions
+        counts = np.bincount(codes[valid], minlength=len(uniques))
+        self.n_duplicated_keys = int((counts > 1).sum())
+        self.n_duplicate_rows = int(counts.sum() - len(uniques))
+
+    def lookup(self, keys: pd.Series) -> np.ndarray:
+        """Fila del dataset indexado para cada clave (-1 si no está)."""
+        codes, uniques, _ = factorize_keys(keys, kind=self.kind)
+        positions = self.index.get_indexer(uniques)
+        return _remap(_remap(self.first_position, positions), codes)
+
+
+class IndexedJoin:
+    """Une un dataset con las columnas seleccionadas de otro mediante un `KeyIndex`."""
+
+    @staticmethod
+    def join(
+        left: pd.DataFrame,
+        left_on: str,
+        right: pd.DataFrame,
+        index: KeyIndex,
+        columns: List[str],
+        suffixes: Tuple[str, str] = ("_x", "_y")
+    ) -> Tuple[pd.DataFrame, Dict[str, int]]:
+        """
+        Unión interna de `left` con `right[columns]`.
+
+        Args:
+            left (pd.DataFrame): Dataset principal.
+            left_on (str): Columna identificadora de `left`.
+            right (pd.DataFrame): Dataset indexado.
+            index (KeyIndex): Índice sobre la columna identificadora de `right`.
+            columns (List[str]): Columnas de `right` que se añaden.
+            suffixes (Tuple[str, str]): Sufijos para columnas con el mismo nombre, como en `merge`.
+
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, int]]: Resultado y estadísticas de la unión.
+        """
+        rows = index.lookup(left[left_on])
+        matched = rows >= 0
+        left_rows = np.flatnonzero(matched)
+        result = left.take(left_rows).reset_index(drop=True)
+        added = right[columns].take(rows[matched]).reset_index(drop=True)
+        overlap = set(result.columns) & set(added.columns)
+        if overlap:
+            result = result.rename(columns={c: f"{c}{suffixes[0]}" for c in overlap})
+            added = added.rename(columns={c: f"{c}{suffixes[1]}" for c in overlap})
+        result = pd.concat([result, added], axis=1)
+        stats = {
+            'filas': len(left),
+            'coincidencias': int(matched.sum()),
+            'sin_coincidencia': int((~matched).sum()),
+            'ids_duplicados': index.n_duplicated_keys,
+            'filas_duplicadas_descartadas': index.n_duplicate_rows,
+            'ids_vacios': index.n_missing_keys,
+        }
+        return result, stats
+
+
+# Para compatibilidad
+indexed_join = IndexedJoin.join
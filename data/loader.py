@@ -1,17 +1,63 @@
+import os
 import pandas as pd
-import streamlit as st
 from typing import Optional
+from data.cache import DatasetCache, hash_file
+from utils.profiling import profiled
+import config
+
+# Streamlit se importa dentro de los métodos de interfaz para que el pipeline por
+# lotes (batch.py) pueda cargar datos sin la app.
 
 
 class DataLoader:
     """Responsable de cargar archivos de datos."""
 
+    _cache: Optional[DatasetCache] = None
+
+    @classmethod
+    def get_cache(cls) -> DatasetCache:
+        """Devuelve la caché de datasets compartida entre sesiones."""
+        if cls._cache is None:
+            cls._cache = DatasetCache(
+                os.path.join(config.CACHE_DIR, "datasets"),
+                config.DATASET_CACHE_MAX_BYTES
+            )
+        return cls._cache
+
     @staticmethod
+    def _file_key(uploaded) -> str:
+        """Hash del archivo subido, memorizado por sesión para no recalcularlo en cada rerun."""
+        import streamlit as st
+
+        digests = st.session_state.setdefault('dataset_digests', {})
+        upload_id = getattr(uploaded, 'file_id', None) or (uploaded.name, uploaded.size)
+        if upload_id not in digests:
+            digests[upload_id] = hash_file(uploaded)
+        return digests[upload_id]
+
+    @staticmethod
+    @profiled
+    def load_path(path: str) -> pd.DataFrame:
+        """Carga un CSV desde disco a través de la misma caché Arrow que usa la app."""
+        with open(path, "rb") as f:
+            key = hash_file(f)
+            df = DataLoader.get_cache().load(f, key=key)
+        df.attrs['digest'] = key
+        return df
+
+    @staticmethod
+    @profiled
     def load_csv(label: str = "Carga tu CSV") -> Optional[pd.DataFrame]:
+        import streamlit as st
+
         uploaded = st.file_uploader(label, type="csv")
         if uploaded:
             try:
-                return pd.read_csv(uploaded)
+                key = DataLoader._file_key(uploaded)
+                df = DataLoader.get_cache().load(uploaded, key=key)
+                # Permite a otras páginas reutilizar estructuras derivadas del mismo archivo
+                df.attrs['digest'] = key
+                return df
             except Exception as e:
                 st.error(f"Error cargando el archivo: {e}")
         return None
@@ -19,3 +65,4 @@ class DataLoader:
 
 # Para compatibilidad
 load_csv = DataLoader.load_csv
+load_path = DataLoader.load_path
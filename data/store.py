@@ -0,0 +1,255 @@
+"""Almacén de datos por sesión con presupuesto de memoria."""
+
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import config
+
+
+class SessionDataStore:
+    """
+    Un dataset canónico por sesión más columnas superpuestas (p. ej. la asignación de cluster).
+
+    Las páginas piden sólo las columnas que necesitan con `frame(columns)` en lugar de
+    guardar copias completas en `st.session_state`. `frame` y `table` no copian datos:
+    devuelven marcos nuevos cuyas columnas numéricas son vistas de sólo lectura, de modo
+    que añadir o reemplazar columnas no altera el almacén y escribir en el sitio falla. Las tablas derivadas (como el merge
+    demográfico) también se registran aquí. Si el total supera `budget_bytes`, las tablas
+    y después el dataset canónico se vuelcan a Feather sin comprimir en disco y se leen
+    mapeados en memoria, columna a columna, cuando se vuelven a pedir.
+    """
+
+    BASE = "__base__"
+
+    def __init__(self, budget_bytes: int, spill_dir: Union[str, Path]):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = Path(spill_dir) / uuid.uuid4().hex
+        self._frames: Dict[str, Optional[pd.DataFrame]] = {}
+        self._spilled: Dict[str, Path] = {}
+        self._overlays: Dict[str, np.ndarray] = {}
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # Los volcados de la sesión se borran cuando el almacén deja de existir
+        weakref.finalize(self, shutil.rmtree, str(self.spill_dir), True)
+
+    # ------------------------------------------------------------------ dataset canónico
+
+    @property
+    def has_dataset(self) -> bool:
+        return self.BASE in self._frames
+
+    @property
+    def columns(self) -> List[str]:
+        """Columnas del dataset canónico seguidas de las superpuestas."""
+        base = [c for c in self._schema(self.BASE) if c not in self._overlays]
+        return base + list(self._overlays)
+
+    def set_dataset(self, df: pd.DataFrame) -> None:
+        """Sustituye el dataset canónico y descarta las columnas superpuestas y tablas derivadas."""
+        with self._lock:
+            self.clear()
+            if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0:
+                df = df.reset_index(drop=True)
+            self._put(self.BASE, df)
+
+    def update_columns(self, df: pd.DataFrame) -> None:
+        """Reemplaza columnas del dataset canónico en su sitio (p. ej. tras limpiarlas)."""
+        with self._lock:
+            base = self._load(self.BASE)
+            for col in df.columns:
+                base[col] = df[col].to_numpy()
+            self._put(self.BASE, base)
+
+    def set_overlay(self, name: str, values: Union[np.ndarray, pd.Series]) -> None:
+        """Añade o reemplaza una columna ligera alineada por posición con el dataset canónico."""
+        values = np.asarray(values)
+        with self._lock:
+            if len(values) != self.n_rows:
+                raise ValueError(
+                    f"La columna '{name}' tiene {len(values)} filas y el dataset {self.n_rows}.")
+            self._overlays[name] = values
+            self._sizes[name] = values.nbytes
+            self._enforce_budget()
+
+    def drop_overlay(self, name: str) -> None:
+        with self._lock:
+            self._overlays.pop(name, None)
+            self._sizes.pop(name, None)
+
+    @property
+    def n_rows(self) -> int:
+        frame = self._frames.get(self.BASE)
+        if frame is not None:
+            return len(frame)
+        return feather.read_table(self._spilled[self.BASE], memory_map=True).num_rows
+
+    def frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        DataFrame con las columnas pedidas del dataset canónico y de las superpuestas.
+
+        Args:
+            columns (Iterable[str], optional): Columnas en el orden deseado; todas si es None.
+
+        Returns:
+            pd.DataFrame: Marco nuevo sin copiar los datos (ver `_readonly_frame`).
+        """
+        with self._lock:
+            columns = self.columns if columns is None else list(columns)
+            base_cols = [c for c in columns if c not in self._overlays]
+            base = self._load(self.BASE, base_cols)
+            return self._readonly_frame(
+                {c: self._overlays[c] if c in self._overlays else base[c] for c in columns},
+                base.index)
+
+    def preview(self, columns: Optional[Iterable[str]] = None, n: int = 5) -> pd.DataFrame:
+        """Primeras `n` filas de `frame(columns)`; sólo se leen esas filas."""
+        with self._lock:
+            columns = self.columns if columns is None else list(columns)
+            base_cols = [c for c in columns if c not in self._overlays]
+            base = self._load(self.BASE, base_cols, n_rows=n)
+            return pd.DataFrame({
+                c: pd.Series(self._overlays[c][:len(base)], index=base.index, name=c)
+                if c in self._overlays else base[c]
+                for c in columns
+            }, index=base.index)
+
+    # ------------------------------------------------------------------ tablas derivadas
+
+    def has_table(self, name: str) -> bool:
+        return name in self._frames
+
+    def set_table(self, name: str, df: pd.DataFrame) -> None:
+        """Registra una tabla derivada (no alineada con el dataset canónico)."""
+        with self._lock:
+            self._put(name, df.reset_index(drop=True))
+
+    def table(self, name: str) -> pd.DataFrame:
+        """Tabla derivada sin copiar los datos (ver `_readonly_frame`)."""
+        with self._lock:
+            table = self._load(name)
+            return self._readonly_frame({c: table[c] for c in table.columns}, table.index)
+
+    def drop_table(self, name: str) -> None:
+        with self._lock:
+            self._drop(name)
+
+    # ------------------------------------------------------------------ memoria
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes en memoria (los volcados a disco no cuentan)."""
+        return sum(self._sizes.values())
+
+    @property
+    def spilled(self) -> List[str]:
+        return [name for name in self._spilled if self._frames.get(name) is None]
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in list(self._frames):
+                self._drop(name)
+            self._overlays.clear()
+            self._sizes.clear()
+
+    def _put(self, name: str, df: pd.DataFrame) -> None:
+        self._drop(name)
+        self._frames[name] = df
+        self._sizes[name] = int(df.memory_usage(deep=True).sum())
+        self._enforce_budget()
+
+    def _drop(self, name: str) -> None:
+        self._frames.pop(name, None)
+        self._sizes.pop(name, None)
+        path = self._spilled.pop(name, None)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def _schema(self, name: str) -> List[str]:
+        frame = self._frames.get(name)
+        if frame is not None:
+            return list(frame.columns)
+        if name in self._spilled:
+            return feather.read_table(self._spilled[name], memory_map=True).column_names
+        return []
+
+    def _load(self, name: str, columns: Optional[List[str]] = None,
+              n_rows: Optional[int] = None) -> pd.DataFrame:
+        """
+        Tabla con al menos `columns` (y sólo las primeras `n_rows` filas, si se indica).
+
+        En memoria se devuelve el propio marco almacenado, sin seleccionar columnas, para
+        no copiarlo; quien llama toma las columnas que necesita. Los volcados sólo leen
+        las columnas y filas pedidas del archivo mapeado.
+        """
+        frame = self._frames[name]
+        if frame is not None:
+            return frame if n_rows is None else frame.iloc[:n_rows]
+        table = feather.read_table(self._spilled[name], columns=columns, memory_map=True)
+        if n_rows is not None:
+            table = table.slice(0, n_rows)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    @staticmethod
+    def _readonly_frame(columns: Dict[str, Union[pd.Series, np.ndarray]],
+                        index: pd.Index) -> pd.DataFrame:
+        """
+        Marco nuevo que comparte los datos de `columns` sin copiarlos.
+
+        Las columnas con tipo de numpy se entregan como vistas de sólo lectura; las de
+        tipos de extensión (categóricas, texto de Arrow) se comparten tal cual.
+        """
+        data = {}
+        for name, values in columns.items():
+            if isinstance(values, pd.Series) and not isinstance(values.dtype, np.dtype):
+                data[name] = values.array
+                continue
+            view = np.asarray(values).view()
+            view.flags.writeable = False
+            data[name] = view
+        return pd.DataFrame(data, index=index, copy=False)
+
+    def _spill(self, name: str) -> None:
+        """Escribe una tabla en disco y libera su copia en memoria."""
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"{name}.arrow"
+        tmp = self.spill_dir / f"{name}.{os.getpid()}.tmp"
+        feather.write_feather(self._frames[name], tmp, compression="uncompressed")
+        os.replace(tmp, path)
+        self._spilled[name] = path
+        self._frames[name] = None
+        self._sizes.pop(name, None)
+
+    def _enforce_budget(self) -> None:
+        """Vuelca tablas derivadas (de mayor a menor) y por último el dataset canónico."""
+        if self.nbytes <= self.budget_bytes:
+            return
+        candidates = sorted(
+            (name for name, frame in self._frames.items()
+             if frame is not None and name != self.BASE),
+            key=lambda name: self._sizes.get(name, 0), reverse=True)
+        if self._frames.get(self.BASE) is not None:
+            candidates.append(self.BASE)
+        for name in candidates:
+            if self.nbytes <= self.budget_bytes:
+                break
+            self._spill(name)
+
+
+def get_data_store() -> SessionDataStore:
+    """Almacén de datos de la sesión de Streamlit actual."""
+    import streamlit as st
+
+    if 'data_store' not in st.session_state:
+        st.session_state['data_store'] = SessionDataStore(
+            config.SESSION_MEMORY_BUDGET_BYTES,
+            os.path.join(config.CACHE_DIR, "sessions"))
+    return st.session_state['data_store']
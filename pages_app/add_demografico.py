@@ -1,6 +1,11 @@
 import streamlit as st
+import pandas as pd
 from data.loader import load_csv
 from utils.export import export_results
+from utils.aggregates import ClusterAggregates, is_numeric_column
+from data.cache import frame_fingerprint
+from data.join import KeyIndex, indexed_join
+from data.store import get_data_store
 from utils.plots import (
     plot_countplot, plot_boxplot, plot_heatmap, plot_radar_chart, plot_bar_chart
 )
@@ -9,16 +14,48 @@ from utils.plots import (
 class DemographicEnrichmentPage:
     """Página de enriquecimiento demográfico y visualización."""
 
+    @staticmethod
+    def demo_columns(merged: pd.DataFrame, demo_vars: list) -> dict:
+        """Columna del merge para cada variable demográfica (original o con sufijo _x/_y)."""
+        found = {}
+        for var in demo_vars:
+            col = next((c for c in [var, f"{var}_x", f"{var}_y"] if c in merged.columns), None)
+            if col:
+                found[var] = col
+        return found
+
+    @staticmethod
+    def get_aggregates(merged: pd.DataFrame, cluster_col: str) -> ClusterAggregates:
+        """Agregados cluster × variable del merge actual, calculados una sola vez por merge."""
+        if 'demo_aggregates' not in st.session_state:
+            columns = DemographicEnrichmentPage.demo_columns(
+                merged, st.session_state['demo_vars'])
+            st.session_state['demo_aggregates'] = ClusterAggregates(
+                merged, cluster_col, list(columns.values()))
+        return st.session_state['demo_aggregates']
+
+    @staticmethod
+    def get_demo_index(df_demo: pd.DataFrame, id_col: str) -> KeyIndex:
+        """Índice hash del identificador demográfico, reutilizado mientras no cambie el archivo."""
+        key = (df_demo.attrs.get('digest'), id_col)
+        cached = st.session_state.get('demo_index')
+        if key[0] is None or cached is None or cached[0] != key:
+            cached = (key, KeyIndex(df_demo[id_col]))
+            st.session_state['demo_index'] = cached
+        return cached[1]
+
     @staticmethod
     def show() -> None:
         st.header("4. Enriquecimiento Demográfico")
+        cluster_col = 'cluster'
+        store = get_data_store()
         df_demo = load_csv()
         if df_demo is not None and ('models' in st.session_state or st.session_state.get('method') == "LDA"):
             cluster_col = 'cluster' if st.session_state.get(
                 'method') == "LDA" else 'cluster'
-            df = st.session_state['df'][[
+            df = store.frame([
                 st.session_state['id_col'], cluster_col
-            ] + (st.session_state.get('vars', []) or st.session_state.get('cat_vars', []))].copy()
+            ] + (st.session_state.get('vars', []) or st.session_state.get('cat_vars', [])))
             id_col = st.session_state.get('id_col_demo', None)
             if id_col not in df_demo.columns:
                 st.warning(
@@ -33,11 +70,6 @@ class DemographicEnrichmentPage:
             else:
                 st.session_state['id_col_demo'] = id_col
 
-            df[st.session_state['id_col']
-               ] = df[st.session_state['id_col']].astype(str)
-            df_demo[st.session_state['id_col_demo']
-                    ] = df_demo[st.session_state['id_col_demo']].astype(str)
-
             st.info(
                 "Selecciona las columnas demográficas relevantes para el análisis.")
             demo_vars = st.multiselect(
@@ -53,29 +85,41 @@ class DemographicEnrichmentPage:
                     return
 
                 st.session_state['demo_vars'] = demo_vars
-                df_demo_reduced = df_demo[[
-                    st.session_state['id_col_demo']] + demo_vars]
                 try:
-                    merged = df.merge(
-                        df_demo_reduced,
-                        left_on=st.session_state['id_col'],
-                        right_on=st.session_state['id_col_demo'],
-                        how='inner'
-                    )
-                    st.session_state['merged'] = merged
+                    index = DemographicEnrichmentPage.get_demo_index(
+                        df_demo, st.session_state['id_col_demo'])
+                    merged, stats = indexed_join(
+                        df, st.session_state['id_col'], df_demo, index, demo_vars)
+                    store.set_table('merged', merged)
+                    st.session_state['join_stats'] = stats
+                    st.session_state['merged_fingerprint'] = frame_fingerprint(merged)
+                    st.session_state.pop('demo_aggregates', None)
                     st.success("Merge realizado correctamente.")
                 except Exception as e:
                     st.error(f"Error al realizar el merge: {e}")
                     return
 
-        if 'merged' in st.session_state:
+        if store.has_table('merged'):
+            merged = store.table('merged')
+            stats = st.session_state.get('join_stats')
+            if stats:
+                st.caption(
+                    f"Coincidencias: {stats['coincidencias']:,} de {stats['filas']:,} filas · "
+                    f"sin coincidencia: {stats['sin_coincidencia']:,} · "
+                    f"IDs demográficos duplicados: {stats['ids_duplicados']:,}")
+                if stats['filas_duplicadas_descartadas']:
+                    st.warning(
+                        f"{stats['filas_duplicadas_descartadas']:,} filas demográficas con ID repetido "
+                        "se ignoraron; se usó la primera aparición de cada ID.")
             st.subheader("Vista previa del merge realizado:")
-            st.write(st.session_state['merged'].head())
+            st.write(merged.head())
+            aggregates = DemographicEnrichmentPage.get_aggregates(merged, cluster_col)
             export_results(
-                st.session_state['merged'], st.session_state.get('models', {}))
+                merged, st.session_state.get('models', {}),
+                st.session_state.get('merged_fingerprint'), aggregates=aggregates)
             st.subheader("Visualizaciones Demográficas")
             st.plotly_chart(plot_countplot(
-                st.session_state['merged'], cluster_col))
+                merged, cluster_col, aggregates=aggregates))
 
             st.subheader("Heatmaps por Variable Demográfica")
             heatmap_cols = st.columns(2)
@@ -83,11 +127,12 @@ class DemographicEnrichmentPage:
                 # Buscar la columna original o con sufijo _x/_y
                 col_candidates = [var, f"{var}_x", f"{var}_y"]
                 col_found = next(
-                    (c for c in col_candidates if c in st.session_state['merged'].columns), None)
+                    (c for c in col_candidates if c in merged.columns), None)
                 if col_found:
                     with heatmap_cols[i % 2]:
                         st.plotly_chart(plot_heatmap(
-                            st.session_state['merged'], cluster_col, col_found))
+                            merged, cluster_col, col_found,
+                            aggregates=aggregates))
                 else:
                     with heatmap_cols[i % 2]:
                         st.info(
@@ -100,11 +145,12 @@ class DemographicEnrichmentPage:
             for i, var in enumerate(st.session_state['demo_vars']):
                 col_candidates = [var, f"{var}_x", f"{var}_y"]
                 col_found = next(
-                    (c for c in col_candidates if c in st.session_state['merged'].columns), None)
-                if col_found and st.session_state['merged'][col_found].dtype in ['int64', 'float64']:
+                    (c for c in col_candidates if c in merged.columns), None)
+                if col_found and is_numeric_column(merged[col_found]):
                     with boxplot_cols[i % 2]:
                         st.plotly_chart(plot_boxplot(
-                            st.session_state['merged'], col_found, cluster_col))
+                            merged, col_found, cluster_col,
+                            aggregates=aggregates))
                 elif col_found:
                     with boxplot_cols[i % 2]:
                         st.info(f"La variable '{var}' no es numérica.")
@@ -113,17 +159,18 @@ class DemographicEnrichmentPage:
                         st.info(
                             f"La variable '{var}' no está presente en el merge.")
 
-            if cluster_col in st.session_state['merged'].columns and len(st.session_state['merged'][cluster_col].unique()) <= 5:
+            if cluster_col in merged.columns and len(aggregates.sizes) <= 5:
                 st.subheader("Radar Chart")
                 radar_vars = []
                 for v in st.session_state['demo_vars']:
                     for c in [v, f"{v}_x", f"{v}_y"]:
-                        if c in st.session_state['merged'].columns:
+                        if c in merged.columns:
                             radar_vars.append(c)
                             break
                 if radar_vars:
                     st.plotly_chart(plot_radar_chart(
-                        st.session_state['merged'], cluster_col, radar_vars))
+                        merged, cluster_col, radar_vars,
+                        aggregates=aggregates))
                 else:
                     st.info("No hay variables válidas para el radar chart.")
 
@@ -132,11 +179,12 @@ class DemographicEnrichmentPage:
             for i, var in enumerate(st.session_state['demo_vars']):
                 col_candidates = [var, f"{var}_x", f"{var}_y"]
                 col_found = next(
-                    (c for c in col_candidates if c in st.session_state['merged'].columns), None)
-                if col_found and st.session_state['merged'][col_found].dtype == 'object':
+                    (c for c in col_candidates if c in merged.columns), None)
+                if col_found and merged[col_found].dtype in ['object', 'category']:
                     with barplot_cols[i % 2]:
                         st.plotly_chart(plot_bar_chart(
-                            st.session_state['merged'], col_found, cluster_col))
+                            merged, col_found, cluster_col,
+                            aggregates=aggregates))
                 elif col_found:
                     with barplot_cols[i % 2]:
                         st.info(f"La variable '{var}' no es categórica.")
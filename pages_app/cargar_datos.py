@@ -1,6 +1,8 @@
 import streamlit as st
 from data.loader import load_csv
-from utils.cleaning import clean_data
+from utils.cleaning import DataCleaner
+from data.store import get_data_store
+import config
 
 
 class DataSelectionPage:
@@ -24,11 +26,16 @@ class DataSelectionPage:
 
         df = load_csv()
         if df is not None:
+            # Detener un clustering en curso sobre el dataset anterior
+            job = st.session_state.pop('clustering_job', None)
+            if job is not None:
+                job.cancel()
+            get_data_store().clear()
             # Limpiar variables de session_state relacionadas con el dataset anterior
             for key in [
-                'id_col', 'vars', 'cat_vars', 'preview_cleaned', 'df', 'models',
-                'metrics', 'inertia', 'silhouette_scores', 'optimal_k', 'viz_k_opt',
-                'cluster_preview', 'lda_df', 'lda_probas', 'merged', 'id_col_demo',
+                'id_col', 'vars', 'cat_vars', 'preview_cleaned', 'models',
+                'metrics', 'inertia', 'silhouette_scores', 'silhouette_table', 'optimal_k', 'k_criterion', 'metrics_table', 'viz_k_opt',
+                'cluster_preview', 'lda_probas', 'lda_models', 'lda_X', 'lda_metrics', 'merged_fingerprint', 'demo_aggregates', 'join_stats', 'demo_index', 'precision_check', 'k_sweep', 'cleaner', 'artifact', 'stability', 'id_col_demo',
                 'demo_vars'
             ]:
                 if key in st.session_state:
@@ -50,7 +57,8 @@ class DataSelectionPage:
             st.session_state['id_col'] = id_col
 
             numeric_cols = df.select_dtypes(include="number").columns.tolist()
-            cat_cols = df.select_dtypes(include="object").columns.tolist()
+            cat_cols = df.select_dtypes(
+                include=["object", "category"]).columns.tolist()
 
             seleccion = st.multiselect(
                 "Variables numéricas para segmentar (GMM/K-Means)",
@@ -63,16 +71,36 @@ class DataSelectionPage:
                 default=[]
             )
 
+            precisions = ["float64", "float32"]
+            dtype = st.radio(
+                "Precisión numérica",
+                precisions,
+                index=precisions.index(
+                    st.session_state.get('dtype', config.NUMERIC_DTYPE)),
+                horizontal=True,
+                help="float32 reduce a la mitad la memoria de los datos limpios y acelera "
+                     "el clustering; puedes verificar la concordancia con float64 en la "
+                     "pestaña de Clustering."
+            )
+
             if st.button("Confirmar selección de variables"):
+                store = get_data_store()
+                store.set_dataset(df)
+                # Los modelos ajustados con la selección anterior dejan de servir
+                for key in ['cleaner', 'k_sweep']:
+                    st.session_state.pop(key, None)
                 if seleccion:
                     st.write("Variables seleccionadas:", seleccion)
-                    df[seleccion] = clean_data(df[seleccion])
+                    cleaner = DataCleaner(dtype=dtype)
+                    store.update_columns(cleaner.clean(df[seleccion]))
+                    # Medias y escalador se conservan para el modelo descargable
+                    st.session_state['cleaner'] = cleaner
                     st.success("Datos limpiados correctamente.")
-                st.session_state['df'] = df
                 st.session_state['vars'] = seleccion
                 st.session_state['cat_vars'] = seleccion_cat
-                st.session_state['preview_cleaned'] = df[seleccion].head(
-                ) if seleccion else df.head()
+                st.session_state['dtype'] = dtype
+                st.session_state['preview_cleaned'] = store.preview(
+                    seleccion or None)
                 st.subheader(
                     "Vista previa de los datos seleccionados y limpiados:")
                 st.write(st.session_state['preview_cleaned'])
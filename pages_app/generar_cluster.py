@@ -1,116 +1,371 @@
 import streamlit as st
-from utils.clustering import run_gmm, run_kmeans, compute_aic_bic, compute_silhouette, run_lda_segmentation
+import pandas as pd
+from typing import Any, Callable
+from utils.clustering import (
+    STRATEGIES, run_lda_range, compute_lda_metrics, model_labels, check_float32_agreement,
+    KSweepStore, AdaptiveKSearch, LDAClustering, StabilityAnalysis, fit_encoder
+)
+from utils.scoring import SegmentationArtifact
+from utils.jobs import ClusteringJob
 import plotly.express as px
 import numpy as np
+import config
+from data.cache import get_model_cache
+from data.store import get_data_store
 
 
 class ClusteringPage:
     """Página para ejecutar clustering y visualizar métricas."""
 
+    @staticmethod
+    def plot_metrics(method: str, ks: list, metrics: pd.DataFrame, inertia: list,
+                     silhouette_table: pd.DataFrame, key_suffix: str = "",
+                     indices: pd.DataFrame = None) -> None:
+        """Gráficas del codo (AIC/BIC o inercia), del Silhouette Score y de los índices internos."""
+        if method == "GMM" and metrics is not None:
+            st.plotly_chart(
+                px.line(
+                    metrics,
+                    x='k',
+                    y=['AIC', 'BIC'],
+                    title="Gráfica del Codo (AIC/BIC)"
+                ),
+                key="gmm_aic_bic" + key_suffix
+            )
+        elif method in ["K-Means", "Mini-Batch K-Means"] and inertia is not None:
+            st.plotly_chart(
+                px.line(
+                    x=ks,
+                    y=inertia,
+                    title="Elbow Method (Inercia)",
+                    labels={'x': 'Número de Clusters', 'y': 'Inercia'}
+                ),
+                key="kmeans_inertia" + key_suffix
+            )
+
+        if silhouette_table is not None and not silhouette_table.empty:
+            sampled = silhouette_table['ci_high'].notna().any()
+            st.plotly_chart(
+                px.line(
+                    x=silhouette_table['k'].tolist(),
+                    y=silhouette_table['silhouette'].tolist(),
+                    error_y=(silhouette_table['ci_high'] - silhouette_table['silhouette']
+                             ).to_numpy() if sampled else None,
+                    title="Silhouette Score" + (
+                        " (estimado por muestreo, IC 95%)" if sampled else ""),
+                    labels={'x': 'Número de Clusters',
+                            'y': 'Silhouette Score'}
+                ),
+                key="silhouette_score" + key_suffix
+            )
+
+        if indices is not None:
+            calinski_col, davies_col = st.columns(2)
+            with calinski_col:
+                st.plotly_chart(
+                    px.line(indices, x='k', y='calinski_harabasz',
+                            title="Calinski-Harabasz (mayor es mejor)"),
+                    key="calinski_harabasz" + key_suffix
+                )
+            with davies_col:
+                st.plotly_chart(
+                    px.line(indices, x='k', y='davies_bouldin',
+                            title="Davies-Bouldin (menor es mejor)"),
+                    key="davies_bouldin" + key_suffix
+                )
+
+    @staticmethod
+    def sweep() -> KSweepStore:
+        """Modelos y métricas ya evaluados sobre el dataset actual de la sesión."""
+        if 'k_sweep' not in st.session_state:
+            st.session_state['k_sweep'] = KSweepStore()
+        return st.session_state['k_sweep']
+
+    @staticmethod
+    def start_job(method: str, df: pd.DataFrame, adaptive: bool = False) -> None:
+        """Lanza el barrido de k en segundo plano, cancelando uno anterior si sigue en curso."""
+        previous = st.session_state.get('clustering_job')
+        if previous is not None and previous.running:
+            previous.cancel()
+        for key in ['models', 'metrics', 'inertia', 'silhouette_scores', 'silhouette_table',
+                    'optimal_k', 'k_criterion', 'metrics_table', 'cluster_preview',
+                    'precision_check', 'artifact', 'stability']:
+            st.session_state.pop(key, None)
+        k_min, k_max = st.session_state['k_min'], st.session_state['k_max']
+        strategy = STRATEGIES[method]()
+        search = AdaptiveKSearch(
+            k_min, k_max, AdaptiveKSearch.criterion_for(strategy)) if adaptive else None
+        st.session_state['clustering_job'] = ClusteringJob(
+            strategy, df, range(k_min, k_max + 1),
+            sample_size=config.SILHOUETTE_SAMPLE_SIZE,
+            n_jobs=config.CLUSTERING_N_JOBS,
+            cache=get_model_cache(),
+            sweep=ClusteringPage.sweep(),
+            search=search
+        ).start()
+        st.session_state['method'] = method
+
+    @staticmethod
+    @st.fragment(run_every=1.0)
+    def job_progress() -> None:
+        """Muestra el avance del barrido y las métricas de cada k a medida que terminan."""
+        job = st.session_state.get('clustering_job')
+        if job is None:
+            return
+        if not job.running:
+            st.rerun()
+        models, rows = job.snapshot()
+        if job.search is None:
+            st.progress(job.progress,
+                        text=f"Ajustando modelos: {len(models)} de {len(job.ks)} valores de k")
+        else:
+            st.progress(job.progress,
+                        text=f"Búsqueda adaptativa: {len(models)} valores de k evaluados "
+                             f"de {len(job.ks)} posibles")
+        if st.button("Cancelar clustering"):
+            job.cancel()
+            st.info("Cancelando: se detendrá al terminar el k en curso.")
+        if not rows.empty:
+            ClusteringPage.plot_metrics(
+                st.session_state.get('method'),
+                rows['k'].tolist(),
+                rows[['k', 'AIC', 'BIC']] if 'AIC' in rows else None,
+                rows['inertia'].tolist() if 'inertia' in rows else None,
+                rows[['k', 'silhouette', 'ci_low', 'ci_high']].dropna(subset=['silhouette'])
+                if 'silhouette' in rows else None,
+                key_suffix="_partial",
+                indices=rows[['k', 'calinski_harabasz', 'davies_bouldin']]
+            )
+
+    @staticmethod
+    def collect_job(job: ClusteringJob) -> None:
+        """Pasa los resultados de un barrido terminado al estado de la sesión."""
+        del st.session_state['clustering_job']
+        models, rows = job.snapshot()
+        if job.status == ClusteringJob.FAILED:
+            st.error(f"Error durante el clustering:\n\n{job.error}")
+            return
+        if not models:
+            st.warning("El clustering se canceló antes de terminar ningún valor de k.")
+            return
+        if job.status == ClusteringJob.CANCELLED:
+            st.info(f"Clustering cancelado: se conservan {len(models)} valores de k.")
+        if job.reused:
+            st.caption(f"{job.reused} de {len(job.ks)} valores de k reutilizados de "
+                       "barridos anteriores; sólo se ajustaron los nuevos.")
+        st.session_state['models'] = models
+        if 'AIC' in rows:
+            st.session_state['metrics'] = rows[['k', 'AIC', 'BIC']]
+        if 'inertia' in rows:
+            st.session_state['inertia'] = rows['inertia'].tolist()
+        st.session_state['silhouette_table'] = rows[['k', 'silhouette', 'ci_low', 'ci_high']]
+        st.session_state['silhouette_scores'] = rows['silhouette'].tolist()
+        st.session_state['metrics_table'] = rows
+        if job.search is not None:
+            st.caption(f"Búsqueda adaptativa: se ajustaron {len(models)} de "
+                       f"{len(job.ks)} valores de k.")
+        st.session_state['optimal_k'] = job.optimal_k or list(models.keys())[0]
+        st.session_state['k_criterion'] = (
+            job.search.criterion if job.search else AdaptiveKSearch.criterion_for(job.strategy))
+
+    @staticmethod
+    def keep_artifact(artifact: SegmentationArtifact) -> None:
+        """Serializa el modelo elegido una sola vez, al confirmar k, y guarda los bytes."""
+        st.session_state['artifact'] = {
+            'data': artifact.to_bytes(),
+            'file_name': f"segmentacion_{artifact.method.replace(' ', '_')}_k{artifact.k}.joblib",
+        }
+
+    @staticmethod
+    def artifact_download(artifact: dict) -> None:
+        """Descarga del modelo elegido para asignar clientes nuevos con `score.py`."""
+        st.download_button(
+            "💾 Descargar modelo de segmentación",
+            data=artifact['data'],
+            file_name=artifact['file_name'],
+            help="Incluye la imputación, el escalado (o la codificación) y el modelo. "
+                 "Asigna clientes nuevos con: python score.py modelo.joblib nuevos.csv "
+                 "--out asignaciones.csv"
+        )
+
+    @staticmethod
+    def stability_section(strategy, models: dict, load_data: Callable[[], Any], key: str) -> None:
+        """
+        Estabilidad de los k elegidos por remuestreo, junto a las gráficas del codo.
+
+        `load_data` devuelve los datos del ajuste; sólo se llama al pulsar el botón.
+        """
+        with st.expander("Estabilidad de los segmentos (remuestreo)"):
+            available = list(models)
+            center = st.session_state.get('optimal_k', available[0])
+            nearby = [k for k in available if abs(k - center) <= config.STABILITY_NEIGHBOURS]
+            ks = st.multiselect(
+                "Valores de k", available, default=nearby or available[:1],
+                key=f"{key}_ks",
+                help="Por defecto, el k propuesto y sus vecinos: cada k añadido "
+                     "suma tantos ajustes como réplicas por k.")
+            replicates_col, sample_col = st.columns(2)
+            n_replicates = replicates_col.number_input(
+                "Réplicas por k", min_value=5, max_value=200,
+                value=config.STABILITY_REPLICATES, step=5, key=f"{key}_replicas")
+            sample_size = sample_col.number_input(
+                "Filas por réplica", min_value=500, max_value=1_000_000,
+                value=config.STABILITY_SAMPLE_SIZE, step=500, key=f"{key}_filas")
+            if st.button("Analizar estabilidad", key=f"{key}_estabilidad", disabled=not ks):
+                with st.spinner(f"Ajustando {n_replicates * len(ks)} réplicas..."):
+                    st.session_state['stability'] = StabilityAnalysis(
+                        n_replicates=int(n_replicates), sample_size=int(sample_size)
+                    ).run(strategy, load_data(), {k: models[k] for k in sorted(ks)},
+                          n_jobs=config.CLUSTERING_N_JOBS)
+            replicates = st.session_state.get('stability')
+            if replicates is None:
+                st.caption("Cada réplica reajusta el modelo sobre una submuestra y mide "
+                           "cuánto coincide con la segmentación completa.")
+                return
+            ari_col, jaccard_col = st.columns(2)
+            with ari_col:
+                st.plotly_chart(
+                    px.box(replicates, x='k', y='ARI',
+                           title="Rand ajustado frente al ajuste completo"),
+                    key=f"{key}_stability_ari"
+                )
+            with jaccard_col:
+                st.plotly_chart(
+                    px.box(replicates, x='k', y='Jaccard',
+                           title="Jaccard de pares agrupados juntos"),
+                    key=f"{key}_stability_jaccard"
+                )
+            st.dataframe(StabilityAnalysis.summarize(replicates), hide_index=True)
+            st.caption("Valores cercanos a 1 indican segmentos que se reproducen en "
+                       "cualquier submuestra; por debajo de ~0.6 la partición es inestable.")
+
+    @staticmethod
+    def proposed_k() -> None:
+        """Indica el k propuesto automáticamente y el criterio usado."""
+        k = st.session_state.get('optimal_k')
+        criterion = st.session_state.get('k_criterion')
+        if k is None or criterion is None:
+            return
+        reasons = {
+            "BIC": "el menor k cuyo BIC está a menos del 2% del recorrido del mínimo",
+            "silhouette": "el menor k cuyo Silhouette está a menos del 2% del recorrido del máximo",
+            "Perplexity": "la menor perplejidad",
+        }
+        st.info(f"k propuesto: **{k}** ({reasons[criterion]}).")
+
+    @staticmethod
+    def precision_check(method: str, load_data: Callable[[], pd.DataFrame], ks: list) -> None:
+        """
+        Compara el ajuste en float32 con float64 sobre una muestra de los datos.
+
+        `load_data` devuelve los datos del ajuste; sólo se llama al pulsar el botón.
+        """
+        with st.expander("Verificar precisión float32"):
+            if st.button("Comparar con float64"):
+                with st.spinner("Ajustando en float32 y float64..."):
+                    st.session_state['precision_check'] = check_float32_agreement(
+                        STRATEGIES[method](), load_data(), ks,
+                        n_jobs=config.CLUSTERING_N_JOBS)
+            check = st.session_state.get('precision_check')
+            if check is None:
+                return
+            st.dataframe(check, hide_index=True)
+            if check['ok'].all():
+                st.success("float32 reproduce los resultados de float64 en todos los k.")
+            else:
+                failed = check.loc[~check['ok'], 'k'].tolist()
+                st.warning(f"float32 difiere de float64 en k = {failed}; "
+                           "usa float64 si necesitas esos valores de k.")
+
     @staticmethod
     def show() -> None:
         st.header("2. Clustering")
-        if 'df' not in st.session_state:
+        store = get_data_store()
+        if not store.has_dataset:
             st.warning("Carga primero los datos en la pestaña anterior.")
             return
-        df = st.session_state['df']
         numeric_vars = st.session_state.get('vars', [])
         cat_vars = st.session_state.get('cat_vars', [])
 
+        methods = ["GMM", "K-Means", "Mini-Batch K-Means", "LDA"]
         method = st.selectbox(
             "Selecciona el método de clustering",
-            ["GMM", "K-Means", "LDA"],
-            index=["GMM", "K-Means",
-                   "LDA"].index(st.session_state.get('method', "GMM"))
+            methods,
+            index=methods.index(st.session_state.get('method', "GMM"))
         )
 
-        if method == "LDA":
-            n_segments = st.slider(
-                "Selecciona el número de clusters (LDA)",
-                2, 10, st.session_state.get('n_segments', 4)
-            )
-            st.session_state['n_segments'] = n_segments
-        else:
-            k_min, k_max = st.slider(
-                "Rango de clusters",
-                2, 10, (st.session_state.get('k_min', 2),
-                        st.session_state.get('k_max', 5))
+        k_min, k_max = st.slider(
+            "Rango de clusters",
+            2, 10, (st.session_state.get('k_min', 2),
+                    st.session_state.get('k_max', 5))
+        )
+        st.session_state['k_min'], st.session_state['k_max'] = k_min, k_max
+        adaptive = False
+        if method in STRATEGIES:
+            adaptive = st.checkbox(
+                "Búsqueda adaptativa de k",
+                value=st.session_state.get('adaptive_k', False),
+                help="Evalúa primero una rejilla gruesa del rango, se detiene cuando el "
+                     "criterio (BIC en GMM, Silhouette en K-Means) deja de mejorar y "
+                     "refina alrededor del mejor k. Útil con rangos amplios."
             )
-            st.session_state['k_min'], st.session_state['k_max'] = k_min, k_max
+            st.session_state['adaptive_k'] = adaptive
 
         if st.button("Ejecutar clustering"):
-            if method == "GMM":
-                models = run_gmm(
-                    df[numeric_vars], st.session_state['k_min'], st.session_state['k_max'])
-                metrics = compute_aic_bic(models, df[numeric_vars])
-                st.session_state['metrics'] = metrics
-                st.session_state['models'] = models
-                st.session_state['method'] = method
-                silhouette_scores = compute_silhouette(
-                    models, df[numeric_vars])
-                st.session_state['silhouette_scores'] = silhouette_scores
-                available_clusters = list(models.keys())
-                st.session_state['optimal_k'] = available_clusters[0]
-            elif method == "K-Means":
-                models = run_kmeans(
-                    df[numeric_vars], st.session_state['k_min'], st.session_state['k_max'])
-                inertia = [model.inertia_ for model in models.values()]
-                st.session_state['inertia'] = inertia
-                st.session_state['models'] = models
-                st.session_state['method'] = method
-                silhouette_scores = compute_silhouette(
-                    models, df[numeric_vars])
-                st.session_state['silhouette_scores'] = silhouette_scores
-                available_clusters = list(models.keys())
-                st.session_state['optimal_k'] = available_clusters[0]
+            if method in STRATEGIES:
+                ClusteringPage.start_job(method, store.frame(numeric_vars), adaptive)
             elif method == "LDA":
                 if not cat_vars:
                     st.warning(
                         "Selecciona al menos una variable categórica para LDA.")
                     return
-                df_out, probas = run_lda_segmentation(
-                    df, cat_vars, st.session_state['n_segments'])
-                st.session_state['lda_df'] = df_out
-                st.session_state['lda_probas'] = probas
+                with st.spinner("Ajustando LDA para cada número de segmentos..."):
+                    models, X = run_lda_range(
+                        store.frame(cat_vars), cat_vars, k_min, k_max,
+                        n_jobs=config.CLUSTERING_N_JOBS, cache=get_model_cache(),
+                        sweep=ClusteringPage.sweep())
+                    st.session_state['lda_metrics'] = compute_lda_metrics(models, X)
+                for key in ['lda_probas', 'cluster_preview', 'artifact', 'stability']:
+                    st.session_state.pop(key, None)
+                st.session_state['lda_models'] = models
+                st.session_state['lda_X'] = X
                 st.session_state['method'] = method
-                st.session_state['optimal_k'] = st.session_state['n_segments']
+                lda_metrics = st.session_state['lda_metrics']
+                st.session_state['optimal_k'] = int(
+                    lda_metrics.loc[lda_metrics['Perplexity'].idxmin(), 'k'])
+                st.session_state['k_criterion'] = "Perplexity"
 
-        # Visualización y selección de clusters para GMM/K-Means
-        if 'models' in st.session_state and st.session_state.get('method') in ["GMM", "K-Means"]:
-            if st.session_state['method'] == "GMM" and 'metrics' in st.session_state:
-                st.plotly_chart(
-                    px.line(
-                        st.session_state['metrics'],
-                        x='k',
-                        y=['AIC', 'BIC'],
-                        title="Gráfica del Codo (AIC/BIC)"
-                    ),
-                    key="gmm_aic_bic"
-                )
-            elif st.session_state['method'] == "K-Means" and 'inertia' in st.session_state:
-                st.plotly_chart(
-                    px.line(
-                        x=list(st.session_state['models'].keys()),
-                        y=st.session_state['inertia'],
-                        title="Elbow Method (Inercia)",
-                        labels={'x': 'Número de Clusters', 'y': 'Inercia'}
-                    ),
-                    key="kmeans_inertia"
-                )
+        job = st.session_state.get('clustering_job')
+        if job is not None and job.running:
+            ClusteringPage.job_progress()
+            return
+        if job is not None:
+            ClusteringPage.collect_job(job)
 
-            if 'silhouette_scores' in st.session_state:
-                st.plotly_chart(
-                    px.line(
-                        x=list(st.session_state['models'].keys()),
-                        y=st.session_state['silhouette_scores'],
-                        title="Silhouette Score",
-                        labels={'x': 'Número de Clusters',
-                                'y': 'Silhouette Score'}
-                    ),
-                    key="silhouette_score"
-                )
+        # Visualización y selección de clusters para GMM/K-Means/Mini-Batch K-Means
+        if 'models' in st.session_state and st.session_state.get('method') in STRATEGIES:
+            ClusteringPage.plot_metrics(
+                st.session_state['method'],
+                list(st.session_state['models'].keys()),
+                st.session_state.get('metrics'),
+                st.session_state.get('inertia'),
+                st.session_state.get('silhouette_table'),
+                indices=st.session_state['metrics_table'][
+                    ['k', 'calinski_harabasz', 'davies_bouldin']]
+            )
+            with st.expander("Tabla de métricas"):
+                st.dataframe(st.session_state['metrics_table'], hide_index=True)
+            ClusteringPage.stability_section(
+                STRATEGIES[st.session_state['method']](), st.session_state['models'],
+                lambda: store.frame(numeric_vars), key="numeric")
+
+            if st.session_state.get('dtype') == "float32":
+                ClusteringPage.precision_check(
+                    st.session_state['method'], lambda: store.frame(numeric_vars),
+                    list(st.session_state['models'].keys()))
 
             available_clusters = list(st.session_state['models'].keys())
+            ClusteringPage.proposed_k()
             selected_k = st.selectbox(
                 "Selecciona el número de clusters óptimo",
                 available_clusters,
@@ -122,23 +377,66 @@ class ClusteringPage:
                 st.session_state['optimal_k'] = selected_k
                 model = st.session_state['models'][st.session_state['optimal_k']]
                 # Solo pasar las variables seleccionadas para predecir
-                st.session_state['df']['cluster'] = model.predict(
-                    df[numeric_vars])
-                st.session_state['cluster_preview'] = st.session_state['df'][numeric_vars + [
-                    'cluster']].head()
+                store.set_overlay('cluster', model_labels(
+                    model, store.frame(numeric_vars)))
+                st.session_state['cluster_preview'] = store.preview(
+                    numeric_vars + ['cluster'])
+                cleaner = st.session_state.get('cleaner')
+                if cleaner is not None:
+                    ClusteringPage.keep_artifact(SegmentationArtifact.from_cleaner(
+                        st.session_state['method'], model, cleaner,
+                        id_col=st.session_state.get('id_col')))
                 st.success(f"Clusters asignados automáticamente con {method}.")
 
+        # Barrido del número de segmentos para LDA
+        if st.session_state.get('method') == "LDA" and 'lda_models' in st.session_state:
+            lda_metrics = st.session_state['lda_metrics']
+            perplexity_col, likelihood_col = st.columns(2)
+            with perplexity_col:
+                st.plotly_chart(
+                    px.line(lda_metrics, x='k', y='Perplexity',
+                            title="Perplejidad por número de segmentos"),
+                    key="lda_perplexity"
+                )
+            with likelihood_col:
+                st.plotly_chart(
+                    px.line(lda_metrics, x='k', y='LogLikelihood',
+                            title="Log-verosimilitud por número de segmentos"),
+                    key="lda_log_likelihood"
+                )
+            ClusteringPage.stability_section(
+                LDAClustering(), st.session_state['lda_models'],
+                lambda: st.session_state['lda_X'], key="lda")
+
+            available_segments = list(st.session_state['lda_models'].keys())
+            ClusteringPage.proposed_k()
+            selected_k = st.selectbox(
+                "Selecciona el número de segmentos óptimo",
+                available_segments,
+                index=available_segments.index(
+                    st.session_state.get('optimal_k', available_segments[0]))
+            )
+            if st.button("Confirmar número de segmentos"):
+                model = st.session_state['lda_models'][selected_k]
+                probas = model.transform(st.session_state['lda_X'])
+                store.set_overlay('cluster', np.argmax(probas, axis=1))
+                st.session_state['lda_probas'] = probas
+                st.session_state['n_segments'] = selected_k
+                st.session_state['optimal_k'] = selected_k
+                ClusteringPage.keep_artifact(SegmentationArtifact(
+                    "LDA", cat_vars, model,
+                    encoder=fit_encoder(store.frame(cat_vars), cat_vars),
+                    id_col=st.session_state.get('id_col')))
+
         # Visualización y selección para LDA
-        if st.session_state.get('method') == "LDA" and 'lda_df' in st.session_state:
+        if st.session_state.get('method') == "LDA" and 'lda_probas' in st.session_state:
             st.success("Segmentación LDA realizada.")
             st.subheader("Asignación de cluster (LDA):")
             # Mostrar solo una tabla con las variables categóricas seleccionadas y el cluster asignado
             cat_vars = st.session_state.get('cat_vars', [])
             cluster_col = 'cluster'
             cols_to_show = cat_vars + [cluster_col]
-            st.session_state['df'] = st.session_state['lda_df']
-            st.session_state['cluster_preview'] = st.session_state['lda_df'][cols_to_show].head(
-            )
+            st.session_state['cluster_preview'] = store.preview(cols_to_show)
             st.write(st.session_state['cluster_preview'])
 
         if 'cluster_preview' in st.session_state and st.session_state.get('method') != "LDA":
@@ -146,6 +444,9 @@ class ClusteringPage:
                 "Vista previa del cluster asignado:")
             st.write(st.session_state['cluster_preview'])
 
+        if 'artifact' in st.session_state:
+            ClusteringPage.artifact_download(st.session_state['artifact'])
+
 
 # Para compatibilidad
 show = ClusteringPage.show
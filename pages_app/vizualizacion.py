@@ -3,9 +3,11 @@ from utils.plots import (
     plot_membership_heatmap,
     plot_dimensionality_reduction,
     plot_dimensionality_reduction_3d,
-    plot_bar_chart
+    plot_bar_chart,
+    project_clusters
 )
 import numpy as np
+from data.store import get_data_store
 import plotly.express as px
 
 
@@ -16,8 +18,8 @@ class VisualizationPage:
     def show() -> None:
         st.header("3. Visualización de Pertenencias")
         if st.session_state.get('method') == "LDA" and 'lda_probas' in st.session_state:
-            df = st.session_state['df']
             cat_vars = st.session_state.get('cat_vars', [])
+            df = get_data_store().frame(cat_vars + ['cluster'])
             st.subheader(
                 "Distribución de variables categóricas por cluster (LDA)")
             if cat_vars:
@@ -52,12 +54,14 @@ class VisualizationPage:
             model = st.session_state['models'][k_opt]
             st.session_state['heatmap'] = plot_membership_heatmap(
                 model, st.session_state['vars'], width=1000, height=800)
-            selected_df = st.session_state['df'][st.session_state['vars']]
+            selected_df = get_data_store().frame(st.session_state['vars'])
+            # Etiquetas y proyección se calculan una vez para ambas vistas
+            projection = project_clusters(selected_df, model, k=k_opt, method="PCA")
             st.session_state['scatter_plot'] = plot_dimensionality_reduction(
-                selected_df, model, method="PCA"
+                selected_df, model, method="PCA", projection=projection
             )
             st.session_state['scatter_plot_3d'] = plot_dimensionality_reduction_3d(
-                selected_df, model, method="PCA"
+                selected_df, model, method="PCA", projection=projection
             )
 
         if 'heatmap' in st.session_state:
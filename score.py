@@ -0,0 +1,52 @@
+"""
+Asignación de clientes nuevos con un modelo de segmentación guardado, sin Streamlit.
+
+El modelo (`.joblib`) se descarga desde la página de Clustering o lo escribe
+`batch.py` en su directorio de salida.
+
+Uso:
+    python score.py modelo.joblib nuevos.csv --out asignaciones.csv [--n-jobs 8]
+"""
+
+import argparse
+import json
+import time
+from typing import Optional
+
+from utils.profiling import Trace, tracing
+from utils.scoring import BatchScorer, SegmentationArtifact
+import config
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Asigna segmentos a un CSV de clientes nuevos.")
+    parser.add_argument("model", help="Modelo de segmentación (.joblib)")
+    parser.add_argument("data", help="CSV con los clientes a asignar")
+    parser.add_argument("--out", required=True, help="CSV de salida")
+    parser.add_argument("--id-col", help="Columna identificadora (por defecto, la del modelo)")
+    parser.add_argument("--n-jobs", type=int, default=config.CLUSTERING_N_JOBS,
+                        help="Núcleos a usar (-1 = todos)")
+    parser.add_argument("--chunksize", type=int, default=config.SCORING_CHUNKSIZE,
+                        help="Filas por bloque")
+    parser.add_argument("--trace", action="store_true",
+                        help="Imprime el tiempo de cada etapa instrumentada")
+    args = parser.parse_args(argv)
+
+    artifact = SegmentationArtifact.load(args.model)
+    print(f"Modelo {artifact.method} con k={artifact.k} sobre {artifact.variables} "
+          f"(guardado el {artifact.created}).", flush=True)
+    scorer = BatchScorer(artifact, chunksize=args.chunksize, n_jobs=args.n_jobs)
+    trace = Trace() if args.trace else None
+    start = time.perf_counter()
+    with tracing(trace):
+        summary = scorer.score_csv(args.data, args.out, args.id_col)
+    elapsed = time.perf_counter() - start
+    if trace is not None:
+        print(trace.summary().to_string())
+    print(json.dumps(summary))
+    print(f"{summary['filas']:,} filas asignadas en {elapsed:.2f} s "
+          f"({summary['filas'] / max(elapsed, 1e-9):,.0f} filas/s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Agregados cluster × variable compartidos por las vistas demográficas y la exportación."""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+def is_numeric_column(series: pd.Series) -> bool:
+    """Columnas con resumen numérico; las booleanas cuentan como 0/1."""
+    return pd.api.types.is_numeric_dtype(series)
+
+
+class ClusterAggregates:
+    """
+    Conteos cluster × valor y resúmenes numéricos por cluster, calculados una sola vez.
+
+    Los conteos se obtienen con `np.bincount` sobre los códigos de cluster y de valor,
+    sin construir tablas cruzadas ni variables dummy; los resúmenes numéricos salen de
+    un único `groupby` sobre todas las columnas numéricas.
+    """
+
+    NUMERIC_STATS = ['count', 'sum', 'mean', 'min', 'max']
+
+    def __init__(self, df: pd.DataFrame, cluster_col: str, columns: List[str]):
+        self.cluster_col = cluster_col
+        self.columns = list(columns)
+        cluster_codes, clusters = pd.factorize(df[cluster_col], sort=True)
+        self.clusters = pd.Index(clusters, name=cluster_col)
+        n_clusters = len(clusters)
+        valid = cluster_codes >= 0
+        self.sizes = pd.Series(
+            np.bincount(cluster_codes[valid], minlength=n_clusters),
+            index=self.clusters, name="count")
+
+        self.counts: Dict[str, pd.DataFrame] = {}
+        for col in self.columns:
+            value_codes, values = pd.factorize(df[col], sort=True)
+            mask = valid & (value_codes >= 0)
+            flat = cluster_codes[mask] * len(values) + value_codes[mask]
+            table = np.bincount(flat, minlength=n_clusters * len(values))
+            self.counts[col] = pd.DataFrame(
+                table.reshape(n_clusters, len(values)),
+                index=self.clusters,
+                columns=pd.Index(values, name=col))
+
+        self.numeric_columns = [c for c in self.columns if is_numeric_column(df[c])]
+        self.numeric: Optional[pd.DataFrame] = None
+        if self.numeric_columns:
+            # Los cuantiles no admiten booleanos: se resumen como 0/1
+            values = df[self.numeric_columns].astype({
+                c: 'int8' for c in self.numeric_columns
+                if pd.api.types.is_bool_dtype(df[c])})
+            grouped = values.groupby(df[cluster_col], observed=True)
+            quantiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+            quantiles.columns = pd.MultiIndex.from_tuples(
+                [(c, {0.25: 'q1', 0.5: 'median', 0.75: 'q3'}[q]) for c, q in quantiles.columns])
+            self.numeric = pd.concat(
+                [grouped.agg(self.NUMERIC_STATS), quantiles], axis=1).sort_index(axis=1)
+
+    def crosstab(self, col: str, normalize: Optional[str] = None) -> pd.DataFrame:
+        """Tabla cluster × valor, equivalente a `pd.crosstab(df[cluster], df[col])`."""
+        table = self.counts[col]
+        table = table.loc[:, table.sum(axis=0) > 0]
+        if normalize == 'index':
+            return table.div(table.sum(axis=1), axis=0)
+        return table
+
+    def long_counts(self, col: str) -> pd.DataFrame:
+        """Conteos en formato largo (cluster, valor, count) sin combinaciones vacías."""
+        long = self.counts[col].stack().rename("count").reset_index()
+        return long[long["count"] > 0]
+
+    def summary(self, col: str) -> pd.DataFrame:
+        """Resumen numérico de `col` por cluster (count, sum, mean, min, q1, median, q3, max)."""
+        if col not in self.numeric_columns:
+            raise ValueError(
+                f"La columna '{col}' no es numérica o no está incluida en los agregados.")
+        return self.numeric[col]
+
+    def dummy_sums(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Sumas por cluster de `pd.get_dummies(df[columns], drop_first=True)`.
+
+        Las columnas numéricas se suman tal cual; las categóricas aportan una columna
+        `<var>_<valor>` por cada valor salvo el primero.
+        """
+        numeric = [c for c in columns if c in self.numeric_columns]
+        parts = [self.numeric.xs('sum', axis=1, level=1)[numeric]] if numeric else []
+        for col in columns:
+            if col in numeric:
+                continue
+            table = self.counts[col].iloc[:, 1:]
+            parts.append(table.set_axis([f"{col}_{v}" for v in table.columns], axis=1))
+        return pd.concat(parts, axis=1) if parts else pd.DataFrame(index=self.clusters)
+
+
+def build_cluster_aggregates(df: pd.DataFrame, cluster_col: str, columns: List[str]) -> ClusterAggregates:
+    """Función de conveniencia para construir los agregados."""
+    return ClusterAggregates(df, cluster_col, columns)
@@ -1,34 +1,145 @@
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, List
+from utils.profiling import profiled
+
+if TYPE_CHECKING:
+    from sklearn.preprocessing import StandardScaler
+
+# scikit-learn se importa al crear el escalador: la página de carga importa este
+# módulo y no debe cargarlo hasta que se limpien los datos.
 
 
 class DataCleaner:
-    """Responsable de limpiar y normalizar un DataFrame."""
+    """
+    Responsable de limpiar y normalizar un DataFrame.
 
-    def __init__(self, scaler: Optional[StandardScaler] = None):
-        self.scaler = scaler or StandardScaler()
+    Con `dtype=np.float32` la matriz limpia ocupa la mitad de memoria y el clustering,
+    las métricas y las proyecciones trabajan en float32 sin convertirla de nuevo.
+    """
+
+    def __init__(self, scaler: Optional["StandardScaler"] = None, dtype=np.float64):
+        if scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            scaler = StandardScaler()
+        self.scaler = scaler
+        self.dtype = np.dtype(dtype)
+        self.means_: Optional[pd.Series] = None
 
     def fillna_mean(self, df: pd.DataFrame) -> pd.DataFrame:
         """Rellena valores faltantes con la media de cada columna numérica."""
-        return df.fillna(df.mean(numeric_only=True))
+        self.means_ = df.mean(numeric_only=True)
+        return df.fillna(self.means_)
 
     def normalize(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Normaliza las columnas numéricas."""
+        """Normaliza las columnas numéricas en la precisión `dtype`."""
         return pd.DataFrame(
-            self.scaler.fit_transform(df),
+            self.scaler.fit_transform(df.to_numpy(dtype=self.dtype)),
             columns=df.columns,
             index=df.index
         )
 
+    @profiled
     def clean(self, df: pd.DataFrame) -> pd.DataFrame:
         """Limpia y normaliza el DataFrame."""
         df_filled = self.fillna_mean(df)
         return self.normalize(df_filled)
 
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Imputa y escala con las medias y el escalador ya ajustados (p. ej. datos nuevos)."""
+        if self.means_ is None:
+            raise ValueError("El limpiador no ha sido ajustado.")
+        columns = list(self.means_.index)
+        filled = df[columns].fillna(self.means_)
+        return pd.DataFrame(
+            self.scaler.transform(filled.to_numpy(dtype=self.dtype)),
+            columns=columns,
+            index=df.index
+        )
+
+
+class StreamingDataCleaner:
+    """
+    Limpia un CSV por bloques en dos pasadas, sin cargarlo entero en memoria.
+
+    La primera pasada acumula medias y varianzas con `StandardScaler.partial_fit`
+    (que ignora los NaN); la segunda imputa y escala cada bloque y lo escribe en
+    un arreglo `.npy` mapeado en memoria. El resultado coincide con `DataCleaner`.
+    """
+
+    def __init__(self, chunksize: int = 100_000, dtype=np.float64):
+        self.chunksize = chunksize
+        self.dtype = dtype
+        self.scaler: Optional["StandardScaler"] = None
+        self.means_: Optional[pd.Series] = None
+        self.n_rows_: int = 0
+
+    def _chunks(self, source, columns: List[str]):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source, usecols=columns, chunksize=self.chunksize)
+
+    @profiled
+    def fit(self, source, columns: List[str]) -> "StreamingDataCleaner":
+        """Primera pasada: estadísticas por columna equivalentes a imputar con la media."""
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler()
+        n_rows = 0
+        for chunk in self._chunks(source, columns):
+            scaler.partial_fit(chunk[columns].to_numpy(np.float64))
+            n_rows += len(chunk)
+        # partial_fit calcula la varianza sólo sobre los valores presentes; tras imputar
+        # con la media los faltantes no aportan desviación pero sí cuentan en n.
+        n_seen = np.broadcast_to(scaler.n_samples_seen_, scaler.mean_.shape)
+        var = scaler.var_ * n_seen / max(n_rows, 1)
+        scale = np.sqrt(var)
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+        scaler.var_ = var
+        scaler.scale_ = scale
+        scaler.n_samples_seen_ = n_rows
+        self.scaler = scaler
+        self.means_ = pd.Series(scaler.mean_, index=columns)
+        self.n_rows_ = n_rows
+        return self
+
+    @profiled
+    def transform_to_memmap(self, source, columns: List[str], out_path: str) -> np.memmap:
+        """Segunda pasada: imputa y escala cada bloque escribiendo en `out_path`."""
+        if self.scaler is None:
+            raise ValueError("El limpiador no ha sido ajustado.")
+        out = np.lib.format.open_memmap(
+            out_path, mode="w+", dtype=self.dtype, shape=(self.n_rows_, len(columns)))
+        start = 0
+        for chunk in self._chunks(source, columns):
+            block = chunk[columns].fillna(self.means_)
+            stop = start + len(block)
+            out[start:stop] = self.scaler.transform(block.to_numpy(np.float64))
+            start = stop
+        out.flush()
+        return out
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    def clean_csv(self, source, columns: List[str], out_path: str) -> np.memmap:
+        """Ajusta y transforma el CSV completo por bloques."""
+        return self.fit(source, columns).transform_to_memmap(source, columns, out_path)
+
+
+def clean_data(df: pd.DataFrame, dtype=np.float64) -> pd.DataFrame:
     """
     Función de conveniencia para limpiar un DataFrame.
     """
-    return DataCleaner().clean(df)
+    return DataCleaner(dtype=dtype).clean(df)
+
+
+def clean_csv_streaming(
+    source,
+    columns: List[str],
+    out_path: str,
+    chunksize: int = 100_000,
+    dtype=np.float64
+) -> np.memmap:
+    """
+    Función de conveniencia para limpiar un CSV mayor que la memoria disponible.
+    """
+    return StreamingDataCleaner(chunksize=chunksize, dtype=dtype).clean_csv(
+        source, columns, out_path)
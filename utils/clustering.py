@@ -2,12 +2,88 @@
 
 import pandas as pd
 from sklearn.mixture import GaussianMixture
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from typing import Dict, Any, List
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import adjusted_rand_score, pairwise_distances_chunked
+from sklearn.metrics.cluster import pair_confusion_matrix
+from typing import Dict, Any, List, Callable, Iterable, Iterator, Optional, Tuple
+import os
+import threading
+from contextlib import contextmanager
 import numpy as np
+import scipy.sparse as sp
+from scipy.special import logsumexp
+from scipy.stats import norm
+from joblib import Parallel, delayed, effective_n_jobs, parallel_backend
+from threadpoolctl import threadpool_limits
 from sklearn.decomposition import LatentDirichletAllocation
 from sklearn.preprocessing import OneHotEncoder
+from data.cache import ModelCache, frame_fingerprint
+from utils.profiling import profiled
+import config
+
+
+@contextmanager
+def limited_parallel(n_jobs: int, backend: str = "loky", **kwargs: Any) -> Iterator[Parallel]:
+    """
+    `Parallel` de joblib con los hilos BLAS/OpenMP repartidos entre trabajadores.
+
+    Cada trabajador usa como máximo cpu_count // n_jobs hilos internos para no
+    sobresuscribir la CPU.
+    """
+    inner_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    if backend == "loky":
+        with parallel_backend(backend, n_jobs=n_jobs, inner_max_num_threads=inner_threads):
+            yield Parallel(**kwargs)
+    else:
+        with threadpool_limits(limits=inner_threads):
+            yield Parallel(n_jobs=n_jobs, backend=backend, **kwargs)
+
+
+class KSweepStore:
+    """
+    Modelos y métricas de cada k ya evaluados en la sesión.
+
+    Los modelos se indexan por (huella de los datos, estrategia e hiperparámetros, k) y
+    las métricas además por sus propios parámetros (p. ej. el tamaño de muestra del
+    Silhouette), de modo que los barridos sobre la matriz numérica y sobre la one-hot de
+    LDA conviven. Ampliar o reducir el rango de k sólo ajusta los valores que faltan.
+    El almacén no se vacía solo: la página de carga lo descarta al cambiar el dataset o
+    las variables.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, tuple, int], Any] = {}
+        self._metrics: Dict[Tuple[str, tuple, tuple, int], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def model(self, fingerprint: str, params: tuple, k: int) -> Optional[Any]:
+        with self._lock:
+            return self._models.get((fingerprint, params, k))
+
+    def set_model(self, fingerprint: str, params: tuple, k: int, model: Any) -> None:
+        with self._lock:
+            self._models[(fingerprint, params, k)] = model
+
+    def metrics(self, fingerprint: str, params: tuple, metric_params: tuple,
+                k: int) -> Optional[Dict[str, float]]:
+        with self._lock:
+            row = self._metrics.get((fingerprint, params, metric_params, k))
+        return dict(row) if row is not None else None
+
+    def set_metrics(self, fingerprint: str, params: tuple, metric_params: tuple, k: int,
+                    row: Dict[str, float]) -> None:
+        with self._lock:
+            self._metrics[(fingerprint, params, metric_params, k)] = dict(row)
+
+    def ks(self, fingerprint: str, params: tuple) -> List[int]:
+        """Valores de k con modelo guardado para esos datos y esa estrategia."""
+        with self._lock:
+            return sorted(k for f, p, k in self._models if f == fingerprint and p == params)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._metrics.clear()
 
 
 class ClusteringStrategy:
@@ -16,39 +92,707 @@ class ClusteringStrategy:
     def fit(self, df: pd.DataFrame, k: int) -> Any:
         raise NotImplementedError
 
-    def fit_range(self, df: pd.DataFrame, k_min: int, k_max: int) -> Dict[int, Any]:
-        return {k: self.fit(df, k) for k in range(k_min, k_max + 1)}
+    def fit_labeled(self, df: pd.DataFrame, k: int) -> Tuple[Any, np.ndarray]:
+        """
+        Modelo y etiquetas de las filas del ajuste.
+
+        Las etiquetas se devuelven junto al modelo y no se guardan en él, de modo que
+        el modelo (en la caché, la sesión o el artefacto) no crece con los datos.
+        """
+        model = self.fit(df, k)
+        return model, model_labels(model, df)
+
+    def cache_params(self) -> tuple:
+        """Hiperparámetros que identifican los modelos de esta estrategia en la caché."""
+        params = {name: value for name, value in vars(self).items() if name != "n_jobs"}
+        return (type(self).__name__, tuple(sorted(params.items())))
+
+    @profiled
+    def fit_ks(
+        self,
+        df: pd.DataFrame,
+        ks: List[int],
+        n_jobs: int = 1,
+        backend: str = "loky"
+    ) -> Dict[int, Any]:
+        """Ajusta un modelo por cada k de la lista, en paralelo si `n_jobs` != 1."""
+        n_jobs = min(effective_n_jobs(n_jobs), len(ks))
+        if n_jobs <= 1:
+            return {k: self.fit(df, k) for k in ks}
+        with limited_parallel(n_jobs, backend) as parallel:
+            fitted = parallel(delayed(self.fit)(df, k) for k in ks)
+        return dict(zip(ks, fitted))
+
+    def cache_key(self, cache: ModelCache, fingerprint: str, k: int) -> str:
+        return cache.key(self.cache_params(), fingerprint, k)
+
+    @profiled
+    def fit_range(
+        self,
+        df: pd.DataFrame,
+        k_min: int,
+        k_max: int,
+        n_jobs: int = 1,
+        backend: str = "loky",
+        cache: Optional[ModelCache] = None,
+        sweep: Optional[KSweepStore] = None
+    ) -> Dict[int, Any]:
+        """
+        Ajusta un modelo por cada k del rango.
+
+        Args:
+            df: datos de entrada.
+            k_min, k_max: extremos (inclusive) del rango de k.
+            n_jobs: número de trabajadores; 1 ajusta en secuencia, -1 usa todos los núcleos.
+            backend: "loky" (procesos) o "threading" (hilos).
+            cache: caché en disco; sólo se ajustan los k que no estén guardados.
+            sweep: modelos ya ajustados en la sesión; se consultan antes que la caché.
+        Returns:
+            Diccionario {k: modelo} ordenado por k. Como cada ajuste usa una semilla
+            fija, el resultado es idéntico al de la ejecución secuencial.
+        """
+        ks = list(range(k_min, k_max + 1))
+        if cache is None and sweep is None:
+            return self.fit_ks(df, ks, n_jobs, backend)
+
+        fingerprint = frame_fingerprint(df)
+        params = self.cache_params()
+        models: Dict[int, Any] = {k: None for k in ks}
+        if sweep is not None:
+            models = {k: sweep.model(fingerprint, params, k) for k in ks}
+        if cache is not None:
+            for k in ks:
+                if models[k] is None:
+                    models[k] = cache.get(self.cache_key(cache, fingerprint, k))
+        missing = [k for k in ks if models[k] is None]
+        if missing:
+            for k, model in self.fit_ks(df, missing, n_jobs, backend).items():
+                if cache is not None:
+                    cache.set(self.cache_key(cache, fingerprint, k), model)
+                models[k] = model
+        if sweep is not None:
+            for k in ks:
+                sweep.set_model(fingerprint, params, k, models[k])
+        return models
 
 
 class GMMClustering(ClusteringStrategy):
     """Estrategia de clustering usando Gaussian Mixture Models."""
 
     def fit(self, df: pd.DataFrame, k: int) -> GaussianMixture:
+        return self.fit_labeled(df, k)[0]
+
+    @profiled
+    def fit_labeled(self, df: pd.DataFrame, k: int) -> Tuple[GaussianMixture, np.ndarray]:
         gm = GaussianMixture(n_components=k, random_state=0)
-        gm.fit(df)
-        return gm
+        # fit_predict equivale a fit + predict con una sola pasada final
+        return gm, gm.fit_predict(df)
 
 
 class KMeansClustering(ClusteringStrategy):
     """Estrategia de clustering usando KMeans."""
 
     def fit(self, df: pd.DataFrame, k: int) -> KMeans:
+        return self.fit_labeled(df, k)[0]
+
+    @profiled
+    def fit_labeled(self, df: pd.DataFrame, k: int) -> Tuple[KMeans, np.ndarray]:
         km = KMeans(n_clusters=k, random_state=0)
         km.fit(df)
-        return km
+        return km, pop_training_labels(km)
+
+
+class MiniBatchKMeansClustering(ClusteringStrategy):
+    """
+    Estrategia de clustering usando Mini-Batch KMeans.
+
+    `fit` trabaja sobre datos en memoria; `fit_chunks` recibe los datos por bloques
+    y sólo mantiene un bloque a la vez. `batch.py` lo usa en modo `streaming`, sobre el
+    `.npy` mapeado que escribe `StreamingDataCleaner`, recorriéndolo en orden.
+    """
+
+    def __init__(self, batch_size: int = 4096, n_epochs: int = 3):
+        self.batch_size = batch_size
+        self.n_epochs = n_epochs
+
+    def _model(self, k: int) -> MiniBatchKMeans:
+        return MiniBatchKMeans(
+            n_clusters=k, batch_size=self.batch_size, n_init=3, random_state=0)
+
+    def fit(self, df: pd.DataFrame, k: int) -> MiniBatchKMeans:
+        return self.fit_labeled(df, k)[0]
+
+    @profiled
+    def fit_labeled(self, df: pd.DataFrame, k: int) -> Tuple[MiniBatchKMeans, np.ndarray]:
+        mbk = self._model(k)
+        mbk.fit(df)
+        return mbk, pop_training_labels(mbk)
+
+    @profiled
+    def fit_chunks(self, chunks: Callable[[], Iterable[Any]], k: int) -> MiniBatchKMeans:
+        """
+        Ajusta con `partial_fit` recorriendo los bloques `n_epochs` veces.
+
+        Args:
+            chunks: función que devuelve un iterable nuevo de bloques en cada llamada.
+            k: número de clusters.
+        Returns:
+            Modelo ajustado; `inertia_` se recalcula sobre todos los bloques.
+        """
+        mbk = self._model(k)
+        for _ in range(self.n_epochs):
+            for chunk in chunks():
+                mbk.partial_fit(chunk)
+        # partial_fit sólo deja la inercia y las etiquetas del último bloque
+        mbk.inertia_ = -sum(mbk.score(chunk) for chunk in chunks())
+        if hasattr(mbk, "labels_"):
+            del mbk.labels_
+        return mbk
+
+    @profiled
+    def fit_range_chunks(
+        self, chunks: Callable[[], Iterable[Any]], k_min: int, k_max: int
+    ) -> Dict[int, MiniBatchKMeans]:
+        return {k: self.fit_chunks(chunks, k) for k in range(k_min, k_max + 1)}
+
+
+class LDAClustering(ClusteringStrategy):
+    """
+    Estrategia de segmentación con LDA sobre la matriz one-hot dispersa (CSR).
+
+    Con `learning_method="auto"` se usa el aprendizaje por lotes en datos pequeños y
+    el online (mini-batch) cuando hay más de cuatro lotes.
+    """
+
+    def __init__(
+        self,
+        random_state: int = 42,
+        batch_size: int = 1024,
+        learning_method: str = "auto",
+        max_iter: int = 10,
+        n_jobs: Optional[int] = None
+    ):
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.learning_method = learning_method
+        self.max_iter = max_iter
+        self.n_jobs = n_jobs
+
+    def _model(self, k: int, n_samples: int) -> LatentDirichletAllocation:
+        method = self.learning_method
+        if method == "auto":
+            method = "online" if n_samples > 4 * self.batch_size else "batch"
+        return LatentDirichletAllocation(
+            n_components=k,
+            learning_method=method,
+            batch_size=self.batch_size,
+            max_iter=self.max_iter,
+            total_samples=n_samples,
+            n_jobs=self.n_jobs,
+            random_state=self.random_state
+        )
+
+    @profiled
+    def fit(self, X: sp.csr_matrix, k: int) -> LatentDirichletAllocation:
+        lda = self._model(k, X.shape[0])
+        lda.fit(X)
+        return lda
+
+
+# Estrategias numéricas por nombre, como se eligen en la página y en `batch.py`
+STRATEGIES: Dict[str, type] = {
+    "GMM": GMMClustering,
+    "K-Means": KMeansClustering,
+    "Mini-Batch K-Means": MiniBatchKMeansClustering,
+}
+
+
+class AdaptiveKSearch:
+    """
+    Búsqueda de k de grueso a fino con parada por meseta.
+
+    Primero evalúa en orden creciente una rejilla gruesa con paso ~√(k_max - k_min + 1)
+    y deja de ampliarla cuando `patience` evaluaciones seguidas mejoran el criterio
+    menos de `tolerance` veces su recorrido. Después bisecta los huecos a ambos lados
+    del k propuesto hasta que sus vecinos inmediatos estén evaluados. El k propuesto es
+    el menor cuya puntuación queda a menos de `tolerance` del recorrido de la mejor
+    (el codo), de modo que una mejora marginal no añade clusters.
+    """
+
+    # Signo de cada criterio: mayor puntuación = mejor
+    CRITERIA = {"BIC": -1.0, "AIC": -1.0, "silhouette": 1.0}
+
+    def __init__(
+        self,
+        k_min: int,
+        k_max: int,
+        criterion: str = "silhouette",
+        step: Optional[int] = None,
+        tolerance: float = 0.02,
+        patience: int = 2
+    ):
+        if criterion not in self.CRITERIA:
+            raise ValueError(f"Criterio de selección de k no soportado: {criterion}")
+        self.k_min = k_min
+        self.k_max = k_max
+        self.criterion = criterion
+        self.step = step or max(1, int(round(np.sqrt(k_max - k_min + 1))))
+        self.tolerance = tolerance
+        self.patience = patience
+        self.coarse = sorted(set(range(k_min, k_max + 1, self.step)) | {k_max})
+
+    @staticmethod
+    def criterion_for(strategy: ClusteringStrategy) -> str:
+        """BIC para mezclas gaussianas; Silhouette para K-Means (la inercia siempre baja)."""
+        return "BIC" if isinstance(strategy, GMMClustering) else "silhouette"
+
+    def score(self, row: Dict[str, float]) -> float:
+        value = row.get(self.criterion, np.nan)
+        return -np.inf if pd.isna(value) else self.CRITERIA[self.criterion] * value
+
+    @staticmethod
+    def _knee(scores: Dict[int, float], tolerance: float) -> int:
+        values = np.array([scores[k] for k in sorted(scores)])
+        finite = values[np.isfinite(values)]
+        if finite.size == 0:
+            return min(scores)
+        threshold = finite.max() - tolerance * (finite.max() - finite.min())
+        return min(k for k in scores if scores[k] >= threshold)
+
+    def best(self, scores: Dict[int, float]) -> int:
+        return self._knee(scores, self.tolerance)
+
+    @classmethod
+    def best_k(cls, rows: pd.DataFrame, criterion: str, tolerance: float = 0.02) -> Optional[int]:
+        """k propuesto a partir de una tabla de métricas con columnas k y `criterion`."""
+        if rows.empty or criterion not in rows:
+            return None
+        sign = cls.CRITERIA[criterion]
+        scores = {int(k): (-np.inf if pd.isna(v) else sign * v)
+                  for k, v in zip(rows['k'], rows[criterion])}
+        return cls._knee(scores, tolerance)
+
+    def _plateau(self, scores: Dict[int, float]) -> bool:
+        values = [scores[k] for k in self.coarse if k in scores]
+        if len(values) < self.patience + 2:
+            return False
+        spread = max(values) - min(values)
+        if not np.isfinite(spread) or spread <= 0:
+            return True
+        gains, running = [], values[0]
+        for value in values[1:]:
+            gains.append(value - running)
+            running = max(running, value)
+        return all(gain < self.tolerance * spread for gain in gains[-self.patience:])
+
+    def propose(self, scores: Dict[int, float], size: int = 1) -> List[int]:
+        """
+        Siguientes k a evaluar dadas las puntuaciones obtenidas; lista vacía al terminar.
+
+        Args:
+            scores: {k: puntuación} de los k ya evaluados (mayor = mejor).
+            size: número de k que se pueden ajustar en paralelo en la fase gruesa.
+        """
+        pending = [k for k in self.coarse if k not in scores]
+        if pending and not self._plateau(scores):
+            return pending[:max(1, size)]
+        if not scores:
+            return []
+        best = self.best(scores)
+        lower = [k for k in scores if k < best]
+        upper = [k for k in scores if k > best]
+        left = max(lower) if lower else max(self.k_min - 1, best - self.step)
+        right = min(upper) if upper else min(self.k_max + 1, best + self.step)
+        proposals = []
+        if right - best > 1:
+            proposals.append((best + right) // 2)
+        if best - left > 1:
+            proposals.append((left + best) // 2)
+        return proposals
+
+
+def fit_encoder(df: pd.DataFrame, cat_vars: List[str]) -> OneHotEncoder:
+    """Codificador one-hot de las variables categóricas (ignora categorías nuevas)."""
+    encoder = OneHotEncoder(handle_unknown="ignore", dtype=np.float32)
+    return encoder.fit(df[cat_vars])
+
+
+def encode_categorical(
+    df: pd.DataFrame, cat_vars: List[str], encoder: Optional[OneHotEncoder] = None
+) -> tuple[sp.csr_matrix, OneHotEncoder]:
+    """Codifica las variables categóricas en una matriz one-hot dispersa (CSR)."""
+    if encoder is None:
+        encoder = fit_encoder(df, cat_vars)
+    return sp.csr_matrix(encoder.transform(df[cat_vars])), encoder
+
+
+def iter_array_chunks(X: Any, chunksize: int = 100_000) -> Iterator[Any]:
+    """Recorre un arreglo (o memmap) por bloques de filas."""
+    for start in range(0, X.shape[0], chunksize):
+        yield X[start:start + chunksize]
+
+
+def chunked_labels(model: Any, X: Any, chunksize: int = 100_000) -> np.ndarray:
+    """Etiquetas de un arreglo (o memmap) calculadas bloque a bloque."""
+    return np.concatenate(
+        [model_labels(model, chunk) for chunk in iter_array_chunks(X, chunksize)])
+
+
+def pop_training_labels(model: Any) -> np.ndarray:
+    """Quita al modelo las etiquetas del ajuste (`labels_`, una por fila) y las devuelve."""
+    labels = np.asarray(model.labels_)
+    del model.labels_
+    return labels
+
+
+def model_labels(model: Any, df: Any) -> np.ndarray:
+    """Etiquetas que asigna el modelo a `df`."""
+    if not hasattr(model, "predict"):
+        # LDA: segmento de mayor probabilidad
+        return np.argmax(model.transform(df), axis=1)
+    return model.predict(df)
+
+
+class SilhouetteEngine:
+    """
+    Calcula el Silhouette Score de varias particiones de los mismos datos.
+
+    En modo exacto las distancias se recorren una sola vez, por bloques acotados por
+    `working_memory` (MB), y se reutilizan para todos los k. Con `sample_size` se
+    estima sobre una muestra estratificada y se devuelve un intervalo de confianza.
+    Con datos float32 las distancias se calculan en float32 (bloques de la mitad de
+    tamaño) y las sumas por cluster se acumulan en float64.
+    """
+
+    def __init__(
+        self,
+        sample_size: Optional[int] = None,
+        confidence: float = 0.95,
+        working_memory: Optional[int] = None,
+        random_state: int = 0
+    ):
+        self.sample_size = sample_size
+        self.confidence = confidence
+        self.working_memory = working_memory
+        self.random_state = random_state
+
+    def samples(self, X: np.ndarray, labelings: List[np.ndarray]) -> np.ndarray:
+        """Silhouette de cada fila (shape = [n_samples, n_particiones])."""
+        n = X.shape[0]
+        codes, counts, offsets = [], [], [0]
+        for labels in labelings:
+            _, inverse, count = np.unique(labels, return_inverse=True, return_counts=True)
+            codes.append(inverse)
+            counts.append(count)
+            offsets.append(offsets[-1] + len(count))
+        cols = np.concatenate([c + off for c, off in zip(codes, offsets)])
+        rows = np.tile(np.arange(n), len(labelings))
+        # Indicadoras de cluster de todas las particiones, una columna por (k, cluster)
+        members_t = sp.csr_matrix(
+            (np.ones(len(cols)), (cols, rows)), shape=(offsets[-1], n))
+
+        def reduce(D_chunk, start):
+            sums = np.asarray(members_t @ D_chunk.T).T
+            idx = np.arange(D_chunk.shape[0])
+            out = np.empty((D_chunk.shape[0], len(labelings)))
+            for j, (code, count) in enumerate(zip(codes, counts)):
+                block = sums[:, offsets[j]:offsets[j + 1]]
+                own = code[start:start + D_chunk.shape[0]]
+                if len(count) < 2:
+                    out[:, j] = np.nan
+                    continue
+                a = block[idx, own] / np.maximum(count[own] - 1, 1)
+                means = block / count
+                means[idx, own] = np.inf
+                b = means.min(axis=1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    s = (b - a) / np.maximum(a, b)
+                s[count[own] <= 1] = 0.0
+                out[:, j] = np.nan_to_num(s)
+            return out
+
+        chunks = pairwise_distances_chunked(
+            X, reduce_func=reduce, working_memory=self.working_memory)
+        return np.vstack(list(chunks))
+
+    def _sample_indices(self, strata: np.ndarray) -> np.ndarray:
+        """Muestra estratificada con asignación proporcional por cluster."""
+        rng = np.random.default_rng(self.random_state)
+        n = len(strata)
+        picked = []
+        for value in np.unique(strata):
+            members = np.flatnonzero(strata == value)
+            m = min(len(members), max(2, int(round(self.sample_size * len(members) / n))))
+            picked.append(rng.choice(members, size=m, replace=False))
+        return np.sort(np.concatenate(picked))
+
+    @profiled
+    def score(self, labels_by_k: Dict[int, np.ndarray], X: Any) -> pd.DataFrame:
+        """
+        Args:
+            labels_by_k: etiquetas de cada partición {k: labels}.
+            X: datos usados para el clustering.
+        Returns:
+            DataFrame con columnas k, silhouette, ci_low, ci_high (NaN en modo exacto).
+        """
+        X = np.asarray(X)
+        ks = list(labels_by_k)
+        labelings = [np.asarray(labels_by_k[k]) for k in ks]
+        n = X.shape[0]
+        if not self.sample_size or self.sample_size >= n:
+            values = self.samples(X, labelings)
+            return pd.DataFrame({
+                'k': ks,
+                'silhouette': values.mean(axis=0),
+                'ci_low': np.nan,
+                'ci_high': np.nan
+            })
+
+        # Se estratifica por la partición más fina para cubrir todos los clusters
+        strata = labelings[int(np.argmax([len(np.unique(l)) for l in labelings]))]
+        idx = self._sample_indices(strata)
+        values = self.samples(X[idx], [l[idx] for l in labelings])
+        sample_strata = strata[idx]
+        z = norm.ppf(0.5 + self.confidence / 2)
+        means, halves = [], []
+        for j in range(len(ks)):
+            mean, var = 0.0, 0.0
+            for value in np.unique(sample_strata):
+                s = values[sample_strata == value, j]
+                weight = np.count_nonzero(strata == value) / n
+                mean += weight * s.mean()
+                if len(s) > 1:
+                    var += weight ** 2 * s.var(ddof=1) / len(s)
+            means.append(mean)
+            halves.append(z * np.sqrt(var))
+        means, halves = np.array(means), np.array(halves)
+        return pd.DataFrame({
+            'k': ks,
+            'silhouette': means,
+            'ci_low': means - halves,
+            'ci_high': means + halves
+        })
+
+
+def models_signature(models: Dict[int, Any]) -> tuple:
+    """Identifica un conjunto de modelos por su tipo e hiperparámetros."""
+    return tuple(
+        (k, type(model).__name__, repr(sorted(model.get_params().items())))
+        for k, model in models.items()
+    )
+
+
+def cached(cache: Optional[ModelCache], key_parts: tuple, compute: Callable[[], Any]) -> Any:
+    """Evalúa `compute` a través de la caché si se proporciona una."""
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(cache.key(*key_parts), compute)
+
+
+class MetricsEngine:
+    """
+    Métricas de selección de k con un solo paso por modelo.
+
+    En GMM el paso E se hace una vez por bloque de filas y de él salen la
+    log-verosimilitud (AIC, BIC) y las etiquetas. Con las etiquetas se acumulan por
+    cluster el número de filas, la suma de los vectores y la de sus normas al cuadrado;
+    de esas estadísticas suficientes se derivan la inercia y Calinski-Harabasz, y
+    Davies-Bouldin añade una pasada lineal para la distancia media a cada centroide.
+    El Silhouette de todos los k comparte un único recorrido de distancias
+    (`SilhouetteEngine`).
+    """
+
+    def __init__(self, sample_size: Optional[int] = None, chunksize: int = 100_000):
+        self.sample_size = sample_size
+        self.chunksize = chunksize
+
+    def _blocks(self, n: int) -> Iterator[slice]:
+        for start in range(0, n, self.chunksize):
+            yield slice(start, min(start + self.chunksize, n))
+
+    def model_pass(
+        self, model: Any, df: Any, labels: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Optional[float]]:
+        """
+        Etiquetas y log-verosimilitud total (None si el modelo no es probabilístico).
+
+        `labels` son las etiquetas del ajuste, si se conocen; en los modelos no
+        probabilísticos evitan volver a predecir.
+        """
+        if not hasattr(model, "score_samples") or not hasattr(model, "n_components"):
+            return (labels if labels is not None else model_labels(model, df)), None
+        values = np.asarray(df)
+        if not hasattr(model, "_estimate_weighted_log_prob"):
+            # Sin la API interna de scikit-learn: dos pasadas con la API pública
+            log_likelihood = sum(
+                float(model.score_samples(values[rows]).sum(dtype=np.float64))
+                for rows in self._blocks(values.shape[0]))
+            return model_labels(model, values), log_likelihood
+        labels = np.empty(values.shape[0], dtype=np.intp)
+        log_likelihood = 0.0
+        for rows in self._blocks(values.shape[0]):
+            # Mismo cálculo que score_samples (logsumexp) y predict (argmax)
+            weighted = model._estimate_weighted_log_prob(values[rows])
+            log_likelihood += float(logsumexp(weighted, axis=1).sum(dtype=np.float64))
+            labels[rows] = weighted.argmax(axis=1)
+        return labels, log_likelihood
+
+    @staticmethod
+    def n_parameters(model: Any) -> int:
+        """Parámetros libres de una mezcla gaussiana (los que usan `aic` y `bic`)."""
+        if hasattr(model, "_n_parameters"):
+            return int(model._n_parameters())
+        k, d = model.means_.shape
+        covariance = {
+            "full": k * d * (d + 1) / 2,
+            "diag": k * d,
+            "tied": d * (d + 1) / 2,
+            "spherical": k,
+        }[model.covariance_type]
+        return int(covariance + k * d + k - 1)
+
+    def partition_metrics(
+        self, model: Any, df: Any, labels: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Dict[str, float]]:
+        """
+        Etiquetas y métricas de un modelo que no dependen de los demás k: log-verosimilitud,
+        AIC y BIC (modelos probabilísticos), inercia, Calinski-Harabasz y Davies-Bouldin.
+        `labels` son las etiquetas del ajuste sobre `df`, si se conocen.
+        """
+        values = np.asarray(df)
+        labels, log_likelihood = self.model_pass(model, df, labels)
+        row: Dict[str, float] = {}
+        if log_likelihood is not None:
+            n_parameters = self.n_parameters(model)
+            row['log_likelihood'] = log_likelihood
+            row['AIC'] = -2 * log_likelihood + 2 * n_parameters
+            row['BIC'] = -2 * log_likelihood + n_parameters * np.log(values.shape[0])
+        row.update(self.internal_indices(values, labels))
+        return labels, row
+
+    def cluster_statistics(self, values: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
+        """Filas, suma de vectores y suma de normas al cuadrado por cluster (en float64)."""
+        _, codes, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        m, d = len(counts), values.shape[1]
+        sums = np.zeros((m, d))
+        squares = np.zeros(m)
+        for rows in self._blocks(values.shape[0]):
+            block, code = values[rows], codes[rows]
+            members = sp.csr_matrix(
+                (np.ones(len(code)), (code, np.arange(len(code)))), shape=(m, len(code)))
+            sums += members @ block
+            squares += members @ np.einsum('ij,ij->i', block, block, dtype=np.float64)
+        return {'codes': codes, 'counts': counts, 'sums': sums, 'squares': squares}
+
+    def internal_indices(self, values: np.ndarray, labels: np.ndarray) -> Dict[str, float]:
+        """Inercia, Calinski-Harabasz y Davies-Bouldin de una partición."""
+        stats = self.cluster_statistics(values, labels)
+        codes, counts, sums = stats['codes'], stats['counts'], stats['sums']
+        n, m = values.shape[0], len(counts)
+        centroids = sums / counts[:, None]
+        within = np.maximum(stats['squares'] - (sums ** 2).sum(axis=1) / counts, 0.0)
+        inertia = float(within.sum())
+        center = sums.sum(axis=0) / n
+        between = float((counts * ((centroids - center) ** 2).sum(axis=1)).sum())
+        if m < 2:
+            return {'inertia': inertia, 'calinski_harabasz': np.nan, 'davies_bouldin': np.nan}
+        calinski = 1.0 if inertia == 0 else between * (n - m) / (inertia * (m - 1))
+
+        spread = np.zeros(m)
+        for rows in self._blocks(n):
+            code = codes[rows]
+            distances = np.sqrt(((values[rows] - centroids[code]) ** 2).sum(axis=1))
+            spread += np.bincount(code, weights=distances, minlength=m)
+        spread /= counts
+        gaps = np.sqrt(((centroids[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+        if np.allclose(spread, 0) or np.allclose(gaps, 0):
+            davies = 0.0
+        else:
+            gaps[gaps == 0] = np.inf
+            ratios = (spread[:, None] + spread[None, :]) / gaps
+            davies = float(ratios.max(axis=1).mean())
+        return {'inertia': inertia, 'calinski_harabasz': calinski, 'davies_bouldin': davies}
+
+    @profiled
+    def evaluate(self, models: Dict[int, Any], df: Any) -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame con columnas k, log_likelihood, AIC, BIC (sólo modelos
+            probabilísticos), inertia, calinski_harabasz, davies_bouldin, silhouette,
+            ci_low y ci_high.
+        """
+        rows, labelings = [], {}
+        for k, model in models.items():
+            labels, metrics = self.partition_metrics(model, df)
+            rows.append({'k': k, **metrics})
+            labelings[k] = labels
+        silhouette = SilhouetteEngine(sample_size=self.sample_size).score(
+            labelings, np.asarray(df))
+        return pd.DataFrame(rows).merge(silhouette, on='k')
 
 
 class ClusteringMetrics:
     """Responsable de calcular métricas de clustering."""
 
     @staticmethod
-    def compute_aic_bic(models: Dict[int, GaussianMixture], df: pd.DataFrame) -> pd.DataFrame:
+    @profiled
+    def compute_aic_bic(
+        models: Dict[int, GaussianMixture],
+        df: pd.DataFrame,
+        cache: Optional[ModelCache] = None
+    ) -> pd.DataFrame:
+        def compute() -> pd.DataFrame:
+            # aic(df) y bic(df) repetirían cada uno el paso E sobre todos los datos
+            engine = MetricsEngine()
+            n = df.shape[0]
+            rows = []
+            for k, model in models.items():
+                _, log_likelihood = engine.model_pass(model, df)
+                n_parameters = MetricsEngine.n_parameters(model)
+                rows.append({
+                    'k': k,
+                    'AIC': -2 * log_likelihood + 2 * n_parameters,
+                    'BIC': -2 * log_likelihood + n_parameters * np.log(n)
+                })
+            return pd.DataFrame(rows)
+
+        if cache is None:
+            return compute()
+        key = ("aic_bic", frame_fingerprint(df), models_signature(models))
+        return cached(cache, key, compute)
+
+    @staticmethod
+    @profiled
+    def compute_all(
+        models: Dict[int, Any],
+        df: pd.DataFrame,
+        sample_size: Optional[int] = None,
+        cache: Optional[ModelCache] = None
+    ) -> pd.DataFrame:
+        """Todas las métricas de selección de k con `MetricsEngine`."""
+        def compute() -> pd.DataFrame:
+            return MetricsEngine(sample_size=sample_size).evaluate(models, df)
+
+        if cache is None:
+            return compute()
+        key = ("fused_metrics", frame_fingerprint(df), models_signature(models), sample_size)
+        return cached(cache, key, compute)
+
+    @staticmethod
+    @profiled
+    def compute_lda_metrics(
+        models: Dict[int, LatentDirichletAllocation], X: sp.csr_matrix
+    ) -> pd.DataFrame:
+        """Log-verosimilitud aproximada y perplejidad de cada número de segmentos."""
+        word_count = X.sum()
         rows = []
         for k, model in models.items():
+            # perplexity(X) repetiría el paso E de score(X); se deriva de la misma cota
+            log_likelihood = model.score(X)
             rows.append({
                 'k': k,
-                'AIC': model.aic(df),
-                'BIC': model.bic(df)
+                'LogLikelihood': log_likelihood,
+                'Perplexity': np.exp(-log_likelihood / word_count)
             })
         return pd.DataFrame(rows)
 
@@ -57,40 +801,288 @@ class ClusteringMetrics:
         return [model.inertia_ for model in models.values()]
 
     @staticmethod
-    def compute_silhouette(models: Dict[int, Any], df: pd.DataFrame) -> List[float]:
-        scores = []
-        for k, model in models.items():
-            labels = model.predict(df)
-            if len(set(labels)) > 1:
-                score = silhouette_score(df, labels)
-            else:
-                score = float('nan')
-            scores.append(score)
-        return scores
+    @profiled
+    def compute_silhouette_table(
+        models: Dict[int, Any],
+        df: pd.DataFrame,
+        sample_size: Optional[int] = None,
+        cache: Optional[ModelCache] = None
+    ) -> pd.DataFrame:
+        def compute() -> pd.DataFrame:
+            labels_by_k = {k: model_labels(model, df) for k, model in models.items()}
+            return SilhouetteEngine(sample_size=sample_size).score(labels_by_k, df)
+
+        if cache is None:
+            return compute()
+        key = ("silhouette", frame_fingerprint(df), models_signature(models), sample_size)
+        return cached(cache, key, compute)
+
+    @staticmethod
+    def compute_silhouette(
+        models: Dict[int, Any], df: pd.DataFrame, sample_size: Optional[int] = None
+    ) -> List[float]:
+        table = ClusteringMetrics.compute_silhouette_table(models, df, sample_size)
+        return table['silhouette'].tolist()
+
+
+def _stability_replicate(
+    strategy: ClusteringStrategy, X: Any, k: int, reference: np.ndarray, replicate: int
+) -> Dict[str, float]:
+    """Ajusta una réplica y la compara con las etiquetas del ajuste completo en sus filas."""
+    _, labels = strategy.fit_labeled(X, k)
+    pairs = pair_confusion_matrix(reference, labels)
+    together = pairs[1, 1]
+    union = together + pairs[0, 1] + pairs[1, 0]
+    return {
+        'k': k,
+        'replica': replicate,
+        'ARI': adjusted_rand_score(reference, labels),
+        'Jaccard': together / union if union else 1.0,
+    }
+
+
+class StabilityAnalysis:
+    """
+    Estabilidad de las segmentaciones por remuestreo.
+
+    Cada réplica ajusta la estrategia sobre una submuestra acotada (a lo sumo
+    `sample_size` filas y `fraction` del total, sin reemplazo; o bootstrap con
+    `bootstrap=True`) y compara sus etiquetas con las del ajuste sobre todos los datos
+    en esas mismas filas: índice de Rand ajustado y Jaccard de los pares de clientes
+    agrupados juntos. Todas las k usan las mismas submuestras y las réplicas se
+    reparten entre núcleos.
+    """
+
+    def __init__(
+        self,
+        n_replicates: int = 20,
+        sample_size: Optional[int] = 10_000,
+        fraction: float = 0.8,
+        bootstrap: bool = False,
+        random_state: int = 0
+    ):
+        self.n_replicates = n_replicates
+        self.sample_size = sample_size
+        self.fraction = fraction
+        self.bootstrap = bootstrap
+        self.random_state = random_state
 
+    def _indices(self, n: int, replicate: int) -> np.ndarray:
+        rng = np.random.default_rng([self.random_state, replicate])
+        size = max(2, int(n * self.fraction))
+        if self.sample_size:
+            size = min(size, self.sample_size)
+        if self.bootstrap:
+            return np.sort(rng.choice(n, size=size, replace=True))
+        return np.sort(rng.choice(n, size=min(size, n), replace=False))
 
-def run_gmm(df: pd.DataFrame, k_min: int, k_max: int) -> Dict[int, GaussianMixture]:
-    return GMMClustering().fit_range(df, k_min, k_max)
+    @profiled
+    def run(
+        self,
+        strategy: ClusteringStrategy,
+        data: Any,
+        models: Dict[int, Any],
+        n_jobs: int = 1
+    ) -> pd.DataFrame:
+        """
+        Args:
+            strategy: estrategia con la que se ajustaron `models`.
+            data: datos del ajuste completo (DataFrame numérico o matriz CSR en LDA).
+            models: {k: modelo ajustado sobre `data`}.
+            n_jobs: trabajadores; -1 usa todos los núcleos.
+        Returns:
+            DataFrame con una fila por (k, réplica): ARI y Jaccard.
+        """
+        ks = list(models)
+        reference = {k: np.asarray(model_labels(models[k], data)) for k in ks}
+        values = data if sp.issparse(data) else np.asarray(data)
+        samples = [self._indices(values.shape[0], r) for r in range(self.n_replicates)]
+        tasks = [(k, r) for r in range(self.n_replicates) for k in ks]
+        n_jobs = min(effective_n_jobs(n_jobs), len(tasks))
+        if n_jobs <= 1:
+            rows = [_stability_replicate(strategy, values[samples[r]], k,
+                                         reference[k][samples[r]], r) for k, r in tasks]
+        else:
+            with limited_parallel(n_jobs) as parallel:
+                rows = parallel(
+                    delayed(_stability_replicate)(
+                        strategy, values[samples[r]], k, reference[k][samples[r]], r)
+                    for k, r in tasks)
+        return pd.DataFrame(rows).sort_values(['k', 'replica'], ignore_index=True)
 
+    @staticmethod
+    def summarize(replicates: pd.DataFrame) -> pd.DataFrame:
+        """Media, desviación y percentil 5 de ARI y Jaccard por k."""
+        return replicates.groupby('k').agg(
+            ARI_media=('ARI', 'mean'),
+            ARI_desv=('ARI', 'std'),
+            ARI_p5=('ARI', lambda s: s.quantile(0.05)),
+            Jaccard_media=('Jaccard', 'mean'),
+            Jaccard_desv=('Jaccard', 'std'),
+        ).reset_index()
+
+
+class PrecisionCheck:
+    """
+    Comprueba que el ajuste en float32 reproduce el de float64.
+
+    Ajusta la estrategia sobre una misma muestra en ambas precisiones y compara, para
+    cada k, la concordancia de las particiones (ARI), la diferencia relativa del
+    criterio del codo (BIC o inercia) y la diferencia del Silhouette.
+    """
+
+    def __init__(
+        self,
+        sample_size: Optional[int] = 50_000,
+        min_ari: float = 0.99,
+        rel_tolerance: float = 1e-3,
+        silhouette_tolerance: float = 0.01,
+        random_state: int = 0
+    ):
+        self.sample_size = sample_size
+        self.min_ari = min_ari
+        self.rel_tolerance = rel_tolerance
+        self.silhouette_tolerance = silhouette_tolerance
+        self.random_state = random_state
+
+    def _sample(self, df: Any) -> np.ndarray:
+        X = np.asarray(df)
+        if self.sample_size and X.shape[0] > self.sample_size:
+            rng = np.random.default_rng(self.random_state)
+            X = X[np.sort(rng.choice(X.shape[0], size=self.sample_size, replace=False))]
+        return X
+
+    @staticmethod
+    def _criterion(model: Any, X: np.ndarray) -> float:
+        if hasattr(model, "bic"):
+            return model.bic(X)
+        return model.inertia_
+
+    @profiled
+    def compare(
+        self,
+        strategy: ClusteringStrategy,
+        df: Any,
+        ks: Iterable[int],
+        n_jobs: int = 1
+    ) -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame con columnas k, ARI, criterio, dif_rel_criterio, dif_silhouette y ok.
+        """
+        ks = list(ks)
+        X64 = self._sample(df).astype(np.float64)
+        X32 = X64.astype(np.float32)
+        models64 = strategy.fit_ks(X64, ks, n_jobs)
+        models32 = strategy.fit_ks(X32, ks, n_jobs)
+        labels64 = {k: model_labels(models64[k], X64) for k in ks}
+        labels32 = {k: model_labels(models32[k], X32) for k in ks}
+        engine = SilhouetteEngine(sample_size=config.SILHOUETTE_SAMPLE_SIZE,
+                                  random_state=self.random_state)
+        silhouette64 = engine.score(labels64, X64)['silhouette'].to_numpy()
+        silhouette32 = engine.score(labels32, X32)['silhouette'].to_numpy()
 
-def run_kmeans(df: pd.DataFrame, k_min: int, k_max: int) -> Dict[int, KMeans]:
-    return KMeansClustering().fit_range(df, k_min, k_max)
+        rows = []
+        for i, k in enumerate(ks):
+            c64 = self._criterion(models64[k], X64)
+            c32 = self._criterion(models32[k], X32)
+            rows.append({
+                'k': k,
+                'ARI': adjusted_rand_score(labels64[k], labels32[k]),
+                'criterio': "BIC" if hasattr(models64[k], "bic") else "inercia",
+                'dif_rel_criterio': abs(c32 - c64) / max(abs(c64), np.finfo(np.float64).tiny),
+                'dif_silhouette': abs(silhouette32[i] - silhouette64[i]),
+            })
+        result = pd.DataFrame(rows)
+        result['ok'] = (
+            (result['ARI'] >= self.min_ari)
+            & (result['dif_rel_criterio'] <= self.rel_tolerance)
+            & (result['dif_silhouette'] <= self.silhouette_tolerance)
+        )
+        return result
+
+
+def run_gmm(
+    df: pd.DataFrame, k_min: int, k_max: int, n_jobs: int = 1,
+    cache: Optional[ModelCache] = None
+) -> Dict[int, GaussianMixture]:
+    return GMMClustering().fit_range(df, k_min, k_max, n_jobs=n_jobs, cache=cache)
 
 
-def compute_aic_bic(models: Dict[int, GaussianMixture], df: pd.DataFrame) -> pd.DataFrame:
-    return ClusteringMetrics.compute_aic_bic(models, df)
+def run_kmeans(
+    df: pd.DataFrame, k_min: int, k_max: int, n_jobs: int = 1,
+    cache: Optional[ModelCache] = None
+) -> Dict[int, KMeans]:
+    return KMeansClustering().fit_range(df, k_min, k_max, n_jobs=n_jobs, cache=cache)
 
 
-def compute_silhouette(models: Dict[int, Any], df: pd.DataFrame) -> List[float]:
-    return ClusteringMetrics.compute_silhouette(models, df)
+def run_minibatch_kmeans(
+    df: pd.DataFrame, k_min: int, k_max: int, n_jobs: int = 1,
+    cache: Optional[ModelCache] = None
+) -> Dict[int, MiniBatchKMeans]:
+    return MiniBatchKMeansClustering().fit_range(df, k_min, k_max, n_jobs=n_jobs, cache=cache)
+
+
+def compute_aic_bic(
+    models: Dict[int, GaussianMixture], df: pd.DataFrame, cache: Optional[ModelCache] = None
+) -> pd.DataFrame:
+    return ClusteringMetrics.compute_aic_bic(models, df, cache)
+
+
+def compute_silhouette(
+    models: Dict[int, Any], df: pd.DataFrame, sample_size: Optional[int] = None
+) -> List[float]:
+    return ClusteringMetrics.compute_silhouette(models, df, sample_size)
+
+
+def compute_silhouette_table(
+    models: Dict[int, Any],
+    df: pd.DataFrame,
+    sample_size: Optional[int] = None,
+    cache: Optional[ModelCache] = None
+) -> pd.DataFrame:
+    return ClusteringMetrics.compute_silhouette_table(models, df, sample_size, cache)
+
+
+def run_lda_range(
+    df: pd.DataFrame,
+    cat_vars: List[str],
+    k_min: int,
+    k_max: int,
+    random_state: int = 42,
+    n_jobs: int = 1,
+    cache: Optional[ModelCache] = None,
+    sweep: Optional[KSweepStore] = None
+) -> tuple[Dict[int, LatentDirichletAllocation], sp.csr_matrix]:
+    """
+    Ajusta LDA para cada número de segmentos del rango sobre una misma matriz codificada.
+
+    Con `sweep` sólo se ajustan los números de segmentos que no se evaluaron antes.
+
+    Returns:
+        models: {k: modelo LDA}.
+        X: matriz one-hot dispersa compartida por todos los ajustes.
+    """
+    X, _ = encode_categorical(df, cat_vars)
+    models = LDAClustering(random_state=random_state).fit_range(
+        X, k_min, k_max, n_jobs=n_jobs, cache=cache, sweep=sweep)
+    return models, X
+
+
+def compute_lda_metrics(
+    models: Dict[int, LatentDirichletAllocation], X: sp.csr_matrix
+) -> pd.DataFrame:
+    return ClusteringMetrics.compute_lda_metrics(models, X)
 
 
 def run_lda_segmentation(
     df: pd.DataFrame,
     cat_vars: list[str],
     n_segments: int = 4,
-    random_state: int = 42
-) -> tuple[pd.DataFrame, np.ndarray]:
+    random_state: int = 42,
+    cache: Optional[ModelCache] = None,
+    n_jobs: Optional[int] = None
+) -> tuple[pd.Series, np.ndarray]:
     """
     Aplica LDA sobre variables categóricas para segmentar.
     Args:
@@ -98,20 +1090,57 @@ def run_lda_segmentation(
         cat_vars: lista de columnas categóricas.
         n_segments: número de tópicos (clusters).
         random_state: semilla.
+        cache: caché en disco de las probabilidades.
+        n_jobs: núcleos para el paso E de LDA.
     Returns:
-        df_out: copia de df con columna 'cluster'.
+        labels: serie 'cluster' alineada con el índice de df (sin copiar df).
         probas: matriz de probabilidades (shape = [n_samples, n_segments]).
     """
-    data = df[cat_vars].copy()
-    encoder = OneHotEncoder(sparse_output=False)
-    X = encoder.fit_transform(data)
+    data = df[cat_vars]
+    strategy = LDAClustering(random_state=random_state, n_jobs=n_jobs)
 
-    lda = LatentDirichletAllocation(
-        n_components=n_segments, random_state=random_state
-    )
-    probas = lda.fit_transform(X)  # shape (n_samples, n_segments)
+    def compute() -> np.ndarray:
+        X, _ = encode_categorical(data, cat_vars)
+        lda = strategy.fit(X, n_segments)
+        return lda.transform(X)  # shape (n_samples, n_segments)
+
+    if cache is None:
+        probas = compute()
+    else:
+        key = ("lda", frame_fingerprint(data), strategy.cache_params(), n_segments)
+        probas = cached(cache, key, compute)
 
     # Asignamos el cluster de mayor probabilidad
-    df_out = df.copy()
-    df_out["cluster"] = np.argmax(probas, axis=1)
-    return df_out, probas
+    labels = pd.Series(np.argmax(probas, axis=1), index=df.index, name="cluster")
+    return labels, probas
+
+
+def check_float32_agreement(
+    strategy: ClusteringStrategy,
+    df: Any,
+    ks: Iterable[int],
+    sample_size: Optional[int] = 50_000,
+    n_jobs: int = 1
+) -> pd.DataFrame:
+    return PrecisionCheck(sample_size=sample_size).compare(strategy, df, ks, n_jobs=n_jobs)
+
+
+def compute_all_metrics(
+    models: Dict[int, Any],
+    df: pd.DataFrame,
+    sample_size: Optional[int] = None,
+    cache: Optional[ModelCache] = None
+) -> pd.DataFrame:
+    return ClusteringMetrics.compute_all(models, df, sample_size, cache)
+
+
+def run_stability(
+    strategy: ClusteringStrategy,
+    data: Any,
+    models: Dict[int, Any],
+    n_replicates: int = 20,
+    sample_size: Optional[int] = 10_000,
+    n_jobs: int = 1
+) -> pd.DataFrame:
+    return StabilityAnalysis(n_replicates=n_replicates, sample_size=sample_size).run(
+        strategy, data, models, n_jobs=n_jobs)
@@ -1,14 +1,26 @@
+import os
+import threading
 import pandas as pd
-import streamlit as st
 from io import BytesIO
-from pandas import ExcelWriter
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from data.cache import LRUDiskCache, ModelCache, frame_fingerprint
+from utils.aggregates import ClusterAggregates
+from utils.profiling import profiled
+import config
+
+# Streamlit se importa sólo en las funciones de interfaz para poder usar
+# ExcelExporter desde el pipeline por lotes (batch.py); xlsxwriter, sólo al
+# generar el archivo.
 
 
 class ExcelExporter:
     """Responsable de exportar resultados de clustering y datos demográficos a Excel."""
 
-    def __init__(self, merged: pd.DataFrame, demo_vars: List[str], id_col: str = None):
+    # Filas máximas de una hoja de Excel (incluida la cabecera)
+    MAX_ROWS: int = 1_048_576
+
+    def __init__(self, merged: pd.DataFrame, demo_vars: List[str], id_col: str = None,
+                 aggregates: Optional[ClusterAggregates] = None):
         """
         Inicializa el exportador.
 
@@ -16,14 +28,20 @@ class ExcelExporter:
             merged (pd.DataFrame): DataFrame combinado.
             demo_vars (List[str]): Variables demográficas seleccionadas.
             id_col (str, optional): Columna identificadora. Si no se provee, se busca en session_state.
+            aggregates (ClusterAggregates, optional): Agregados precalculados del merge.
         """
+        if id_col is None:
+            import streamlit as st
+            id_col = st.session_state.get('id_col', 'ID')
         self.merged = merged
         self.demo_vars = demo_vars
-        self.id_col = id_col or st.session_state.get('id_col', 'ID')
+        self.id_col = id_col
+        self.aggregates = aggregates
 
     def validate(self) -> bool:
         """Valida que la columna identificadora exista en el DataFrame."""
         if self.id_col not in self.merged.columns:
+            import streamlit as st
             st.error(
                 f"El identificador '{self.id_col}' no está presente en los datos combinados.")
             return False
@@ -48,31 +66,99 @@ class ExcelExporter:
                 return c
         return None
 
-    def to_excel_bytes(self) -> bytes:
-        """Genera el archivo Excel en memoria."""
-        writer = BytesIO()
+    @staticmethod
+    def _write_frame(worksheet, df: pd.DataFrame, chunksize: int, index: bool = False) -> None:
+        """Escribe un DataFrame fila a fila, convirtiendo un bloque de filas a la vez."""
+        if index:
+            df = df.reset_index()
+        if len(df) >= ExcelExporter.MAX_ROWS:
+            raise ValueError(
+                f"{len(df):,} filas no caben en una hoja de Excel; usa `_write_sheets`.")
+        worksheet.write_row(0, 0, [str(c) for c in df.columns])
+        row = 1
+        for start in range(0, len(df), chunksize):
+            block = df.iloc[start:start + chunksize].astype(object)
+            block = block.where(block.notna(), None)
+            for values in block.itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, values)
+                row += 1
+
+    @classmethod
+    def _write_sheets(cls, workbook, name: str, df: pd.DataFrame, chunksize: int,
+                      index: bool = False) -> None:
+        """
+        Escribe `df` en una hoja o, si supera el límite de filas de Excel, en varias
+        hojas "<name> (1)", "<name> (2)"... con la cabecera repetida.
+        """
+        if index:
+            df = df.reset_index()
+        per_sheet = cls.MAX_ROWS - 1
+        if len(df) <= per_sheet:
+            cls._write_frame(workbook.add_worksheet(name[:31]), df, chunksize)
+            return
+        for part, start in enumerate(range(0, len(df), per_sheet), start=1):
+            suffix = f" ({part})"
+            cls._write_frame(workbook.add_worksheet(name[:31 - len(suffix)] + suffix),
+                             df.iloc[start:start + per_sheet], chunksize)
+
+    @property
+    def n_data_sheets(self) -> int:
+        """Hojas necesarias para los datos completos."""
+        return max(1, -(-len(self.merged) // (self.MAX_ROWS - 1)))
+
+    @profiled
+    def write(self, target, chunksize: int = 50_000) -> None:
+        """
+        Genera el archivo Excel en `target` (ruta o buffer).
+
+        Usa el modo de memoria constante de xlsxwriter: cada hoja se escribe por filas
+        y sólo la fila en curso se mantiene en memoria.
+        """
+        import xlsxwriter
+
         cluster_col = self._get_cluster_col()
-        with ExcelWriter(writer, engine='xlsxwriter') as ew:
+        workbook = xlsxwriter.Workbook(target, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd',
+            'nan_inf_to_errors': True
+        })
+        try:
             # Exportar asignaciones
-            self.merged[[self.id_col, cluster_col]].to_excel(
-                ew, sheet_name='Asignaciones', index=False)
+            self._write_sheets(workbook, 'Asignaciones',
+                               self.merged[[self.id_col, cluster_col]], chunksize)
             # Exportar tablas cruzadas para todas las variables seleccionadas
-            for var in self.demo_vars:
-                col = self._find_column(var)
+            columns = [self._find_column(var) for var in self.demo_vars]
+            aggregates = self.aggregates or ClusterAggregates(
+                self.merged, cluster_col, [c for c in columns if c])
+            for var, col in zip(self.demo_vars, columns):
                 if col:
-                    crosstab = pd.crosstab(
-                        self.merged[col], self.merged[cluster_col])
-                    crosstab.to_excel(ew, sheet_name=f'Cross_{var}')
-            # Exportar todos los datos del merge
-            self.merged.to_excel(ew, sheet_name='Datos Completos', index=False)
+                    crosstab = aggregates.crosstab(col).T
+                    self._write_sheets(workbook, f'Cross_{var}', crosstab, chunksize,
+                                       index=True)
+            # Exportar todos los datos del merge (repartidos si superan el límite de Excel)
+            self._write_sheets(workbook, 'Datos Completos', self.merged, chunksize)
+        finally:
+            workbook.close()
+
+    def to_excel_bytes(self) -> bytes:
+        """Genera el archivo Excel en memoria."""
+        writer = BytesIO()
+        self.write(writer)
         return writer.getvalue()
 
+    def cache_key(self, fingerprint: Optional[str] = None) -> str:
+        """Clave del archivo generado: huella de los datos combinados y variables elegidas."""
+        fingerprint = fingerprint or frame_fingerprint(self.merged)
+        return ModelCache.key("excel", fingerprint, tuple(self.demo_vars), self.id_col)
+
 
 class DownloadButtonStyler:
     """Responsable de aplicar estilos al botón de descarga."""
 
     @staticmethod
     def apply():
+        import streamlit as st
+
         st.markdown(
             """
             <style>
@@ -95,22 +181,62 @@ class DownloadButtonStyler:
         )
 
 
-def export_results(merged: pd.DataFrame, models: Dict[int, Any]) -> None:
+_export_cache: Optional[LRUDiskCache] = None
+
+
+def get_export_cache() -> LRUDiskCache:
+    """Devuelve la caché de archivos Excel generados."""
+    global _export_cache
+    if _export_cache is None:
+        _export_cache = LRUDiskCache(
+            os.path.join(config.CACHE_DIR, "exports"), config.EXPORT_CACHE_MAX_BYTES)
+    return _export_cache
+
+
+def export_results(
+    merged: pd.DataFrame,
+    models: Dict[int, Any],
+    fingerprint: Optional[str] = None,
+    aggregates: Optional[ClusterAggregates] = None
+) -> None:
     """
     Exporta los resultados del clustering y las tablas cruzadas a un archivo Excel descargable.
 
+    El archivo sólo se genera cuando el usuario lo pide y se guarda en disco por huella
+    de los datos y variables seleccionadas, de modo que los reruns no lo reconstruyen.
+
     Args:
         merged (pd.DataFrame): DataFrame combinado con clusters y datos demográficos.
         models (Dict[int, Any]): Modelos de clustering entrenados.
+        fingerprint (str, optional): Huella de `merged` si ya se calculó.
+        aggregates (ClusterAggregates, optional): Agregados precalculados del merge.
     """
+    import streamlit as st
+
     demo_vars = st.session_state.get('demo_vars', [])
-    exporter = ExcelExporter(merged, demo_vars)
+    exporter = ExcelExporter(merged, demo_vars, aggregates=aggregates)
     if not exporter.validate():
         return
 
+    cache = get_export_cache()
+    path = cache.path_for(exporter.cache_key(fingerprint), ".xlsx")
     DownloadButtonStyler.apply()
-    st.download_button(
-        "📥 Descargar Excel",
-        data=exporter.to_excel_bytes(),
-        file_name="segmentacion.xlsx"
-    )
+    if exporter.n_data_sheets > 1:
+        st.info(f"Los {len(merged):,} registros superan el límite de filas de una hoja de "
+                f"Excel: las asignaciones y los datos completos se reparten en "
+                f"{exporter.n_data_sheets} hojas numeradas.")
+    if not path.exists():
+        if not st.button("📄 Generar Excel"):
+            return
+        with st.spinner("Generando archivo Excel..."):
+            tmp = cache.path_for(f"{path.stem}.{os.getpid()}.{threading.get_ident()}", ".tmp")
+            exporter.write(str(tmp))
+            os.replace(tmp, path)
+            cache.evict(keep=path)
+    cache.touch(path)
+    with open(path, "rb") as f:
+        st.download_button(
+            "📥 Descargar Excel",
+            data=f,
+            file_name="segmentacion.xlsx"
+        )
@@ -0,0 +1,247 @@
+"""Ejecución en segundo plano de barridos de clustering."""
+
+import contextvars
+import threading
+import traceback
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import delayed, effective_n_jobs
+
+from data.cache import ModelCache, frame_fingerprint
+from utils.clustering import (
+    AdaptiveKSearch, ClusteringStrategy, KSweepStore, MetricsEngine, SilhouetteEngine,
+    limited_parallel, models_signature
+)
+
+
+class ClusteringJob:
+    """
+    Ajusta un rango de k en un hilo y publica las métricas de cada k al terminarlo.
+
+    El hilo no usa Streamlit: la página consulta `snapshot()` en cada rerun, por lo
+    que el trabajo sigue avanzando aunque el usuario cambie de página. Con `sweep`, los
+    k ya evaluados en la sesión se publican sin volver a ajustarlos ni a medirlos. Con
+    `search` sólo se ajustan los k que propone la búsqueda adaptativa dentro de `ks`.
+    La log-verosimilitud, AIC/BIC y los índices internos se publican en cuanto llega
+    cada ajuste; el Silhouette se calcula con un único recorrido de distancias para
+    cada grupo de tantos k como trabajadores (cada lote en la búsqueda adaptativa).
+    Al terminar, `optimal_k` contiene el k propuesto según el criterio de la búsqueda
+    (BIC en GMM, Silhouette en el resto).
+    """
+
+    PENDING, RUNNING, DONE, CANCELLED, FAILED = (
+        "pendiente", "en curso", "terminado", "cancelado", "error")
+
+    def __init__(
+        self,
+        strategy: ClusteringStrategy,
+        df: pd.DataFrame,
+        ks: List[int],
+        sample_size: Optional[int] = None,
+        n_jobs: int = 1,
+        cache: Optional[ModelCache] = None,
+        sweep: Optional[KSweepStore] = None,
+        search: Optional[AdaptiveKSearch] = None
+    ):
+        self.strategy = strategy
+        self.df = df
+        self.ks = list(ks)
+        self.sample_size = sample_size
+        self.n_jobs = n_jobs
+        self.cache = cache
+        self.sweep = sweep
+        self.search = search
+        self.reused = 0
+        self.optimal_k: Optional[int] = None
+        self.status = self.PENDING
+        self.error: Optional[str] = None
+        self._fingerprint: Optional[str] = None
+        self._models: Dict[int, Any] = {}
+        self._rows: Dict[int, Dict[str, float]] = {}
+        # Etiquetas de los k cuyo Silhouette aún no se ha calculado
+        self._pending: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ClusteringJob":
+        self.status = self.RUNNING
+        # El hilo hereda el contexto de quien lo lanza (p. ej. la traza de diagnóstico)
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(target=context.run, args=(self.run,), daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """Solicita la cancelación; el k que se está ajustando termina antes de parar."""
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self.status == self.RUNNING
+
+    @property
+    def progress(self) -> float:
+        with self._lock:
+            return len(self._models) / max(len(self.ks), 1)
+
+    def snapshot(self) -> Tuple[Dict[int, Any], pd.DataFrame]:
+        """Modelos y métricas terminados hasta ahora, ordenados por k."""
+        with self._lock:
+            models = {k: self._models[k] for k in sorted(self._models)}
+            rows = [dict(self._rows[k]) for k in sorted(self._rows)]
+        return models, pd.DataFrame(rows)
+
+    @property
+    def _params(self) -> tuple:
+        return self.strategy.cache_params()
+
+    @property
+    def _metric_params(self) -> tuple:
+        return ("fused_metrics", self.sample_size)
+
+    def _stored_model(self, k: int) -> Optional[Any]:
+        """Modelo ya ajustado para k: primero en la sesión y después en la caché en disco."""
+        if self.sweep is not None:
+            model = self.sweep.model(self._fingerprint, self._params, k)
+            if model is not None:
+                self.reused += 1
+                return model
+        if self.cache is not None:
+            return self.cache.get(self.strategy.cache_key(self.cache, self._fingerprint, k))
+        return None
+
+    def _metrics_key(self, k: int, model: Any) -> str:
+        return self.cache.key("fused_metrics", self._fingerprint,
+                              models_signature({k: model}), self.sample_size)
+
+    def _stored_metrics(self, k: int, model: Any) -> Optional[Dict[str, float]]:
+        """Métricas completas (con Silhouette) ya calculadas para k, si las hay."""
+        if self.sweep is not None:
+            row = self.sweep.metrics(self._fingerprint, self._params, self._metric_params, k)
+            if row is not None:
+                return row
+        if self.cache is not None:
+            row = self.cache.get(self._metrics_key(k, model))
+            if row is not None and self.sweep is not None:
+                self.sweep.set_metrics(
+                    self._fingerprint, self._params, self._metric_params, k, row)
+            return row
+        return None
+
+    def _store_metrics(self, k: int, row: Dict[str, float]) -> None:
+        if self.sweep is not None:
+            self.sweep.set_metrics(self._fingerprint, self._params, self._metric_params, k, row)
+        if self.cache is not None:
+            self.cache.set(self._metrics_key(k, self._models[k]), row)
+
+    def _fits(self, ks: List[int]) -> Iterator[Tuple[int, Any, np.ndarray]]:
+        """Modelo y etiquetas del ajuste de cada k, a medida que terminan."""
+        n_jobs = min(effective_n_jobs(self.n_jobs), len(ks))
+        if n_jobs <= 1:
+            for k in ks:
+                if self._cancel.is_set():
+                    return
+                yield (k, *self.strategy.fit_labeled(self.df, k))
+            return
+        with limited_parallel(n_jobs, return_as="generator") as parallel:
+            fitted = parallel(delayed(self.strategy.fit_labeled)(self.df, k) for k in ks)
+            try:
+                for k, (model, labels) in zip(ks, fitted):
+                    yield k, model, labels
+            finally:
+                # Cerrar el generador descarta los ajustes pendientes
+                fitted.close()
+
+    def _publish(self, k: int, model: Any, labels: Optional[np.ndarray] = None) -> None:
+        """
+        Publica las métricas de k que no dependen de los demás k en cuanto llega el
+        ajuste; el Silhouette queda pendiente hasta `_score_silhouette`. `labels` son
+        las etiquetas del ajuste (None si el modelo viene de la sesión o la caché).
+        """
+        row = self._stored_metrics(k, model)
+        if row is None:
+            labels, metrics = MetricsEngine().partition_metrics(model, self.df, labels)
+            row = {'k': k, **metrics}
+        if self.sweep is not None:
+            self.sweep.set_model(self._fingerprint, self._params, k, model)
+        with self._lock:
+            self._models[k] = model
+            self._rows[k] = row
+            if 'silhouette' not in row:
+                self._pending[k] = np.asarray(labels, dtype=np.int32)
+
+    def _score_silhouette(self) -> None:
+        """Silhouette de todos los k pendientes con un único recorrido de distancias."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        table = SilhouetteEngine(sample_size=self.sample_size).score(pending, self.df)
+        for values in table.to_dict('records'):
+            k = int(values.pop('k'))
+            with self._lock:
+                row = {**self._rows[k], **values}
+                self._rows[k] = row
+            self._store_metrics(k, row)
+
+    def _evaluate(self, ks: List[int], score_every: int) -> None:
+        """
+        Publica los k de `ks`, ajustando sólo los que no estén guardados. El Silhouette
+        se calcula cada `score_every` k pendientes y al final, de modo que la página lo
+        va mostrando mientras avanza el barrido.
+        """
+        missing = []
+        for k in ks:
+            model = self._stored_model(k)
+            if model is None:
+                missing.append(k)
+            else:
+                self._publish(k, model)
+        fits = self._fits(missing)
+        try:
+            for k, model, labels in fits:
+                if self.cache is not None:
+                    self.cache.set(
+                        self.strategy.cache_key(self.cache, self._fingerprint, k), model)
+                self._publish(k, model, labels)
+                if len(self._pending) >= score_every:
+                    self._score_silhouette()
+                if self._cancel.is_set():
+                    break
+        finally:
+            fits.close()
+        self._score_silhouette()
+
+    def _scores(self) -> Dict[int, float]:
+        with self._lock:
+            return {k: self.search.score(row) for k, row in self._rows.items()}
+
+    def run(self) -> "ClusteringJob":
+        """Ejecuta el barrido en el hilo actual (`start` lo lanza en segundo plano)."""
+        self.status = self.RUNNING
+        try:
+            self._fingerprint = frame_fingerprint(self.df)
+            # Tantos k como trabajadores comparten cada recorrido de distancias
+            size = max(1, effective_n_jobs(self.n_jobs))
+            if self.search is None:
+                self._evaluate(self.ks, size)
+                criterion = AdaptiveKSearch.criterion_for(self.strategy)
+            else:
+                while not self._cancel.is_set():
+                    batch = [k for k in self.search.propose(self._scores(), size)
+                             if k in self.ks]
+                    if not batch:
+                        break
+                    self._evaluate(batch, size)
+                criterion = self.search.criterion
+            _, rows = self.snapshot()
+            self.optimal_k = AdaptiveKSearch.best_k(
+                rows, criterion, self.search.tolerance if self.search else 0.02)
+            self.status = self.CANCELLED if self._cancel.is_set() else self.DONE
+        except Exception:
+            self.error = traceback.format_exc()
+            self.status = self.FAILED
+        return self
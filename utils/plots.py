@@ -1,14 +1,140 @@
 import plotly.express as px
+import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from threading import Lock
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.decomposition import PCA
-from typing import Any, List
+from sklearn.decomposition import PCA, IncrementalPCA
+from typing import Any, List, Optional
+from data.cache import frame_fingerprint
+from utils.clustering import model_labels
+from utils.aggregates import ClusterAggregates
+from utils.profiling import profiled
+
+# Filas a partir de las cuales los scatter se dibujan con WebGL en lugar de SVG
+WEBGL_THRESHOLD: int = 10_000
+# Filas a partir de las cuales se agregan (2D) o se muestrean (3D) los puntos
+AGGREGATE_THRESHOLD: int = 200_000
+# Puntos máximos enviados al navegador en modo muestreo
+MAX_POINTS: int = 50_000
+# Celdas por eje de la rejilla de densidad
+DENSITY_BINS: int = 60
+
+
+def stratified_sample(df: pd.DataFrame, label_col: str, max_points: int,
+                      random_state: int = 0) -> pd.DataFrame:
+    """Submuestra proporcional por cluster (al menos un punto por cluster)."""
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(random_state)
+    labels = df[label_col].to_numpy()
+    frac = max_points / len(df)
+    picked = []
+    for value in pd.unique(labels):
+        members = np.flatnonzero(labels == value)
+        size = max(1, int(round(len(members) * frac)))
+        picked.append(rng.choice(members, size=size, replace=False))
+    return df.iloc[np.sort(np.concatenate(picked))]
+
+
+def density_grid(df: pd.DataFrame, x: str, y: str, label_col: str,
+                 bins: int = DENSITY_BINS) -> pd.DataFrame:
+    """Cuenta los puntos de cada cluster en una rejilla bins x bins (centros de celda)."""
+    out = {label_col: df[label_col].to_numpy()}
+    for axis in (x, y):
+        values = df[axis].to_numpy()
+        low, high = values.min(), values.max()
+        step = (high - low) / bins or 1.0
+        cell = np.clip(((values - low) / step).astype(np.int64), 0, bins - 1)
+        out[axis] = low + (cell + 0.5) * step
+    return (pd.DataFrame(out)
+            .groupby([label_col, x, y], observed=True).size()
+            .reset_index(name="Puntos"))
+
+
+class ProjectionService:
+    """
+    Calcula una sola vez las etiquetas y la proyección de 3 componentes de un modelo.
+
+    Las vistas 2D y 3D reutilizan el mismo resultado (las dos primeras componentes
+    de la PCA de 3 coinciden con la PCA de 2). Los resultados se guardan en memoria
+    por (huella de los datos, modelo, k, método, solver).
+    """
+
+    # Filas a partir de las cuales se usa PCA aleatorizada / incremental
+    RANDOMIZED_THRESHOLD: int = 100_000
+    INCREMENTAL_THRESHOLD: int = 2_000_000
+    BATCH_SIZE: int = 100_000
+    MAX_ENTRIES: int = 8
+
+    _cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+    _lock = Lock()
+
+    @classmethod
+    def _solver(cls, n_rows: int, solver: str) -> str:
+        if solver != "auto":
+            return solver
+        if n_rows > cls.INCREMENTAL_THRESHOLD:
+            return "incremental"
+        if n_rows > cls.RANDOMIZED_THRESHOLD:
+            return "randomized"
+        return "full"
+
+    @classmethod
+    def _reduce(cls, X: np.ndarray, n_components: int, solver: str) -> np.ndarray:
+        if solver == "incremental":
+            # Ajuste y transformación por lotes para no duplicar la matriz completa
+            reducer = IncrementalPCA(n_components=n_components)
+            for start in range(0, X.shape[0], cls.BATCH_SIZE):
+                batch = X[start:start + cls.BATCH_SIZE]
+                if batch.shape[0] >= n_components:
+                    reducer.partial_fit(batch)
+            return np.vstack([
+                reducer.transform(X[start:start + cls.BATCH_SIZE])
+                for start in range(0, X.shape[0], cls.BATCH_SIZE)
+            ])
+        if solver in ("randomized", "full"):
+            return PCA(n_components=n_components, svd_solver=solver,
+                       random_state=0).fit_transform(X)
+        raise ValueError(f"Solver de proyección no soportado: {solver}")
+
+    @classmethod
+    @profiled
+    def project(cls, df: pd.DataFrame, model: Any, k: Optional[int] = None,
+                method: str = "PCA", solver: str = "auto") -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame con columnas Dim 1..Dim 3 (o menos si hay menos variables) y Cluster.
+        """
+        if method != "PCA":
+            raise ValueError(
+                "Método de reducción de dimensionalidad no soportado.")
+        solver = cls._solver(len(df), solver)
+        key = (frame_fingerprint(df), type(model).__name__,
+               repr(sorted(model.get_params().items())), k, method, solver)
+        with cls._lock:
+            if key in cls._cache:
+                cls._cache.move_to_end(key)
+                return cls._cache[key]
+
+        n_components = min(3, df.shape[1], df.shape[0])
+        reduced = cls._reduce(df.to_numpy(), n_components, solver)
+        projection = pd.DataFrame(
+            reduced, columns=[f"Dim {i + 1}" for i in range(n_components)])
+        projection["Cluster"] = model_labels(model, df)
+        with cls._lock:
+            cls._cache[key] = projection
+            while len(cls._cache) > cls.MAX_ENTRIES:
+                cls._cache.popitem(last=False)
+        return projection
 
 
 class ClusterPlotter:
     """Responsable de generar visualizaciones para clustering."""
 
     @staticmethod
+    @profiled
     def membership_heatmap(model: Any, variables: List[str], width: int = 800, height: int = 800):
         if hasattr(model, "means_"):
             centroids = model.means_
@@ -38,51 +164,69 @@ class ClusterPlotter:
         return fig
 
     @staticmethod
-    def dimensionality_reduction(df: pd.DataFrame, model: Any, method: str = "PCA", width: int = 800, height: int = 800):
-        labels = model.predict(df) if hasattr(
-            model, "predict") else model.labels_
-        if method == "PCA":
-            reducer = PCA(n_components=2, random_state=0)
-        else:
-            raise ValueError(
-                "Método de reducción de dimensionalidad no soportado.")
-        reduced_data = reducer.fit_transform(df)
-        reduced_df = pd.DataFrame(reduced_data, columns=["Dim 1", "Dim 2"])
-        reduced_df["Cluster"] = labels
-        fig = px.scatter(
-            reduced_df,
-            x="Dim 1",
-            y="Dim 2",
+    @profiled
+    def dimensionality_reduction(df: pd.DataFrame, model: Any, method: str = "PCA", width: int = 800, height: int = 800,
+                                 large_data: str = "density", projection: Optional[pd.DataFrame] = None):
+        """
+        Scatter 2D de la proyección coloreado por cluster.
+
+        Con más de WEBGL_THRESHOLD filas se usa WebGL; con más de AGGREGATE_THRESHOLD
+        los puntos se agregan en una rejilla por cluster (`large_data="density"`) o se
+        submuestrean de forma estratificada (`large_data="sample"`). `projection` permite
+        reutilizar el resultado de `ProjectionService.project`.
+        """
+        if projection is None:
+            projection = ProjectionService.project(df, model, method=method)
+        reduced_df = projection[["Dim 1", "Dim 2", "Cluster"]]
+        title = f"Scatter Plot con {method}"
+        options = dict(
             color="Cluster",
-            title=f"Scatter Plot con {method}",
             color_continuous_scale="Viridis",
             labels={"Cluster": "Cluster"},
             template="plotly_white",
             width=width,
             height=height
         )
+        if len(reduced_df) > AGGREGATE_THRESHOLD:
+            if large_data == "density":
+                grid = density_grid(reduced_df, "Dim 1", "Dim 2", "Cluster")
+                return px.scatter(
+                    grid, x="Dim 1", y="Dim 2", size="Puntos", size_max=12,
+                    hover_data=["Puntos"], render_mode="webgl",
+                    title=f"{title} (densidad agregada)", **options)
+            reduced_df = stratified_sample(reduced_df, "Cluster", MAX_POINTS)
+            title = f"{title} (muestra estratificada)"
+        fig = px.scatter(
+            reduced_df,
+            x="Dim 1",
+            y="Dim 2",
+            title=title,
+            render_mode="webgl" if len(reduced_df) > WEBGL_THRESHOLD else "svg",
+            **options
+        )
         return fig
 
     @staticmethod
-    def dimensionality_reduction_3d(df: pd.DataFrame, model: Any, method: str = "PCA", width: int = 800, height: int = 800):
-        labels = model.predict(df) if hasattr(
-            model, "predict") else model.labels_
-        if method == "PCA":
-            reducer = PCA(n_components=3, random_state=0)
-        else:
-            raise ValueError(
-                "Método de reducción de dimensionalidad no soportado.")
-        reduced_data = reducer.fit_transform(df)
-        reduced_df = pd.DataFrame(reduced_data, columns=[
-                                  "Dim 1", "Dim 2", "Dim 3"])
-        reduced_df["Cluster"] = labels
+    @profiled
+    def dimensionality_reduction_3d(df: pd.DataFrame, model: Any, method: str = "PCA", width: int = 800, height: int = 800,
+                                    projection: Optional[pd.DataFrame] = None):
+        """Scatter 3D (WebGL) de la proyección; por encima de MAX_POINTS se submuestrea por cluster."""
+        if projection is None:
+            projection = ProjectionService.project(df, model, method=method)
+        if "Dim 3" not in projection:
+            raise ValueError("La vista 3D requiere al menos 3 variables.")
+        reduced_df = projection[["Dim 1", "Dim 2", "Dim 3", "Cluster"]]
+        title = f"Scatter Plot con {method} (3D)"
+        if len(reduced_df) > MAX_POINTS:
+            reduced_df = stratified_sample(reduced_df, "Cluster", MAX_POINTS)
+            title = f"{title} (muestra estratificada)"
         fig = px.scatter_3d(
             reduced_df,
             x="Dim 1",
             y="Dim 2",
             z="Dim 3",
             color="Cluster",
-            title=f"Scatter Plot con {method} (3D)",
+            title=title,
             color_continuous_scale="Viridis",
             labels={"Cluster": "Cluster"},
             template="plotly_white",
@@ -92,29 +236,58 @@ class ClusterPlotter:
         return fig
 
     @staticmethod
-    def countplot(df: pd.DataFrame, cluster_col: str):
+    @profiled
+    def countplot(df: pd.DataFrame, cluster_col: str, aggregates: Optional[ClusterAggregates] = None):
+        aggregates = aggregates or ClusterAggregates(df, cluster_col, [])
+        sizes = aggregates.sizes
         return px.pie(
-            df,
-            names=cluster_col,
+            names=sizes.index,
+            values=sizes.to_numpy(),
             title="Distribución de Clusters",
             hole=0.3
         )
 
     @staticmethod
-    def boxplot(df: pd.DataFrame, var: str, cluster_col: str):
-        return px.box(
-            df,
-            x=cluster_col,
-            y=var,
+    @profiled
+    def boxplot(df: pd.DataFrame, var: str, cluster_col: str,
+                aggregates: Optional[ClusterAggregates] = None):
+        """
+        Boxplot a partir de los cuartiles precalculados por cluster.
+
+        Los bigotes se extienden hasta 1.5 veces el rango intercuartílico, recortados
+        al mínimo y máximo del cluster.
+        """
+        aggregates = aggregates or ClusterAggregates(df, cluster_col, [var])
+        summary = aggregates.summary(var)
+        colors = px.colors.qualitative.Plotly
+        fig = go.Figure()
+        for i, (cluster, stats) in enumerate(summary.iterrows()):
+            iqr = stats['q3'] - stats['q1']
+            fig.add_trace(go.Box(
+                name=str(cluster),
+                q1=[stats['q1']],
+                median=[stats['median']],
+                q3=[stats['q3']],
+                mean=[stats['mean']],
+                lowerfence=[max(stats['min'], stats['q1'] - 1.5 * iqr)],
+                upperfence=[min(stats['max'], stats['q3'] + 1.5 * iqr)],
+                marker_color=colors[i % len(colors)]
+            ))
+        fig.update_layout(
             title=f"Boxplot de {var} por Cluster",
-            color=cluster_col,
+            xaxis_title=cluster_col,
+            yaxis_title=var,
+            legend_title_text=cluster_col,
             template="plotly_white"
         )
+        return fig
 
     @staticmethod
-    def heatmap(df: pd.DataFrame, cluster_col: str, var: str):
-        crosstab = pd.crosstab(
-            df[cluster_col], df[var], normalize='index') * 100
+    @profiled
+    def heatmap(df: pd.DataFrame, cluster_col: str, var: str,
+                aggregates: Optional[ClusterAggregates] = None):
+        aggregates = aggregates or ClusterAggregates(df, cluster_col, [var])
+        crosstab = aggregates.crosstab(var, normalize='index') * 100
         return px.imshow(
             crosstab,
             labels=dict(x=var, y="Cluster", color="Proporción (%)"),
@@ -123,10 +296,11 @@ class ClusterPlotter:
         )
 
     @staticmethod
-    def radar_chart(df: pd.DataFrame, cluster_col: str, vars: List[str]):
-        df_encoded = pd.get_dummies(df[vars], drop_first=True)
-        df_encoded[cluster_col] = df[cluster_col]
-        proportions = df_encoded.groupby(cluster_col).sum()
+    @profiled
+    def radar_chart(df: pd.DataFrame, cluster_col: str, vars: List[str],
+                    aggregates: Optional[ClusterAggregates] = None):
+        aggregates = aggregates or ClusterAggregates(df, cluster_col, vars)
+        proportions = aggregates.dummy_sums(vars)
         proportions = proportions.div(
             proportions.sum(axis=1), axis=0).reset_index()
         fig = px.line_polar(
@@ -142,9 +316,12 @@ class ClusterPlotter:
         return fig
 
     @staticmethod
-    def bar_chart(df: pd.DataFrame, var: str, cluster_col: str):
+    @profiled
+    def bar_chart(df: pd.DataFrame, var: str, cluster_col: str,
+                  aggregates: Optional[ClusterAggregates] = None):
+        aggregates = aggregates or ClusterAggregates(df, cluster_col, [var])
         return px.bar(
-            df.groupby([cluster_col, var]).size().reset_index(name="count"),
+            aggregates.long_counts(var),
             x=var,
             y="count",
             color=cluster_col,
@@ -156,6 +333,7 @@ class ClusterPlotter:
 
 # Funciones de conveniencia para mantener compatibilidad
 plot_membership_heatmap = ClusterPlotter.membership_heatmap
+project_clusters = ProjectionService.project
 plot_dimensionality_reduction = ClusterPlotter.dimensionality_reduction
 plot_dimensionality_reduction_3d = ClusterPlotter.dimensionality_reduction_3d
 plot_countplot = ClusterPlotter.countplot
@@ -0,0 +1,196 @@
+"""Instrumentación por etapa: tiempo de pared, CPU, pico de memoria y filas por llamada."""
+
+import functools
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas se importa sólo al mostrar o exportar la traza: este módulo se carga al
+# arrancar app.py y no debe retrasar el primer pintado.
+
+# Tiempos de arranque del proceso, compartidos por todas las sesiones
+startup_times: Dict[str, float] = {}
+
+
+def record_startup(name: str, seconds: float) -> None:
+    """Guarda un tiempo de arranque la primera vez que se mide en el proceso."""
+    startup_times.setdefault(name, seconds)
+
+
+class Trace:
+    """
+    Registro de las llamadas instrumentadas de una sesión.
+
+    Sólo se registran llamadas mientras la traza está activa (ver `tracing`); fuera de
+    ella los decoradores no hacen nada más que consultar una variable de contexto.
+    El pico de memoria usa `tracemalloc`, que es global al proceso y ralentiza las
+    asignaciones, por eso es opcional.
+
+    `thread_cpu_s` y `peak_mb` sólo cubren el hilo que hace la llamada y el proceso
+    principal: el trabajo repartido en procesos de joblib (loky) o en hilos BLAS no
+    aparece en ellos, así que en esas etapas conviene fijarse en `wall_s`.
+    """
+
+    def __init__(self, max_records: int = 5_000, measure_memory: bool = False):
+        self.records: "deque[Dict[str, Any]]" = deque(maxlen=max_records)
+        self.measure_memory = measure_memory
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.records.clear()
+            self.origin = time.perf_counter()
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Una fila por llamada, en orden de inicio."""
+        import pandas as pd
+
+        with self._lock:
+            records = list(self.records)
+        columns = ['name', 'start_s', 'wall_s', 'thread_cpu_s', 'peak_mb', 'rows', 'depth',
+                   'thread']
+        return pd.DataFrame(records, columns=columns).sort_values('start_s', ignore_index=True)
+
+    def summary(self) -> "pd.DataFrame":
+        """Totales por etapa, ordenados por tiempo de pared."""
+        df = self.to_frame()
+        if df.empty:
+            return df
+        return df.groupby('name').agg(
+            llamadas=('wall_s', 'size'),
+            wall_s=('wall_s', 'sum'),
+            thread_cpu_s=('thread_cpu_s', 'sum'),
+            peak_mb=('peak_mb', 'max'),
+            rows=('rows', 'max'),
+        ).sort_values('wall_s', ascending=False)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Formato Trace Event (chrome://tracing, Perfetto) para análisis fuera de la app."""
+        import pandas as pd
+
+        threads: Dict[str, int] = {}
+        events = []
+        for record in self.to_frame().to_dict('records'):
+            tid = threads.setdefault(record['thread'], len(threads) + 1)
+            events.append({
+                'name': record['name'],
+                'ph': 'X',
+                'ts': record['start_s'] * 1e6,
+                'dur': record['wall_s'] * 1e6,
+                'pid': 1,
+                'tid': tid,
+                'args': {k: record[k] for k in ('thread_cpu_s', 'peak_mb', 'rows')
+                         if pd.notna(record[k])},
+            })
+        for name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                           'args': {'name': name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class _Frame:
+    """Llamada instrumentada en curso (para anidar picos de memoria)."""
+
+    __slots__ = ('base_memory', 'max_peak')
+
+    def __init__(self, base_memory: int):
+        self.base_memory = base_memory
+        self.max_peak = base_memory
+
+
+_active_trace: ContextVar[Optional[Trace]] = ContextVar('active_trace', default=None)
+_stack: ContextVar[Tuple[_Frame, ...]] = ContextVar('profiling_stack', default=())
+
+
+@contextmanager
+def tracing(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Activa `trace` en el contexto actual (None desactiva la instrumentación)."""
+    token = _active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _active_trace.reset(token)
+
+
+def set_memory_tracking(trace: Trace, enabled: bool) -> None:
+    """Activa o desactiva la medición del pico de memoria (inicia o detiene tracemalloc)."""
+    trace.measure_memory = enabled
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _rows_of(args: tuple, result: Any) -> Optional[int]:
+    """Filas de la primera entrada con `shape` (o del resultado si no hay ninguna)."""
+    for value in (*args, result):
+        shape = getattr(value, 'shape', None)
+        if shape:
+            return int(shape[0])
+    return None
+
+
+def profiled(func: Callable) -> Callable:
+    """Registra cada llamada a `func` en la traza activa con su `__qualname__` como etapa."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = _active_trace.get()
+        if trace is None:
+            return func(*args, **kwargs)
+
+        stack = _stack.get()
+        memory = trace.measure_memory and tracemalloc.is_tracing()
+        frame = None
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1] is not None:
+                stack[-1].max_peak = max(stack[-1].max_peak, peak)
+            tracemalloc.reset_peak()
+            frame = _Frame(current)
+        token = _stack.set(stack + (frame,))
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - cpu_start
+            _stack.reset(token)
+            peak_mb = None
+            if frame is not None and tracemalloc.is_tracing():
+                peak = max(frame.max_peak, tracemalloc.get_traced_memory()[1])
+                peak_mb = (peak - frame.base_memory) / 1024 ** 2
+                if stack and stack[-1] is not None:
+                    stack[-1].max_peak = max(stack[-1].max_peak, peak)
+            trace.add({
+                'name': name,
+                'start_s': start - trace.origin,
+                'wall_s': wall,
+                'thread_cpu_s': cpu,
+                'peak_mb': peak_mb,
+                'rows': _rows_of(args, result),
+                'depth': len(stack),
+                'thread': threading.current_thread().name,
+            })
+
+    return wrapper
+
+
+def active_trace() -> Optional[Trace]:
+    """Traza activa en el contexto actual, si la hay."""
+    return _active_trace.get()
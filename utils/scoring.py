@@ -0,0 +1,225 @@
+"""Modelo de segmentación persistido y asignación de clientes nuevos por bloques."""
+
+import copy
+import datetime
+import os
+import warnings
+from io import BytesIO
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import delayed, effective_n_jobs
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from utils.cleaning import DataCleaner, StreamingDataCleaner
+from utils.clustering import limited_parallel
+from utils.profiling import profiled
+import config
+
+
+class SegmentationArtifact:
+    """
+    Todo lo necesario para asignar clientes nuevos a los segmentos de un análisis.
+
+    Métodos numéricos (GMM, K-Means, Mini-Batch K-Means): medias de imputación y
+    escalador del `DataCleaner`, variables y modelo. LDA: codificador one-hot,
+    variables categóricas y modelo. El modelo se guarda sin el estado que depende
+    del número de filas del entrenamiento (`TRAINING_STATE`), así que el tamaño del
+    artefacto sólo depende de sus parámetros. Se guarda con joblib (pickle), por lo
+    que sólo deben cargarse artefactos de origen confiable.
+    """
+
+    # Atributos del ajuste con una entrada por fila de entrenamiento
+    TRAINING_STATE = ("labels_",)
+
+    def __init__(
+        self,
+        method: str,
+        variables: List[str],
+        model: Any,
+        means: Optional[pd.Series] = None,
+        scaler: Optional[StandardScaler] = None,
+        encoder: Optional[OneHotEncoder] = None,
+        dtype: str = "float64",
+        id_col: Optional[str] = None
+    ):
+        if encoder is None and (means is None or scaler is None):
+            raise ValueError("Un modelo numérico necesita las medias y el escalador ajustados.")
+        self.method = method
+        self.variables = list(variables)
+        self.model = self.without_training_state(model)
+        self.means = means
+        self.scaler = scaler
+        self.encoder = encoder
+        self.dtype = str(np.dtype(dtype))
+        self.id_col = id_col
+        self.sklearn_version = sklearn.__version__
+        self.created = datetime.datetime.now().isoformat(timespec="seconds")
+
+    @classmethod
+    def without_training_state(cls, model: Any) -> Any:
+        """Copia superficial del modelo sin los atributos de `TRAINING_STATE`."""
+        if not any(hasattr(model, attr) for attr in cls.TRAINING_STATE):
+            return model
+        model = copy.copy(model)
+        for attr in cls.TRAINING_STATE:
+            if hasattr(model, attr):
+                delattr(model, attr)
+        return model
+
+    @classmethod
+    def from_cleaner(cls, method: str, model: Any,
+                     cleaner: Union[DataCleaner, StreamingDataCleaner],
+                     id_col: Optional[str] = None) -> "SegmentationArtifact":
+        """Artefacto numérico a partir del limpiador usado para entrenar el modelo."""
+        if cleaner.means_ is None:
+            raise ValueError("El limpiador no ha sido ajustado.")
+        return cls(method, list(cleaner.means_.index), model, means=cleaner.means_,
+                   scaler=cleaner.scaler, dtype=cleaner.dtype, id_col=id_col)
+
+    @property
+    def k(self) -> int:
+        for attr in ("n_components", "n_clusters"):
+            if hasattr(self.model, attr):
+                return int(getattr(self.model, attr))
+        raise AttributeError("El modelo no indica su número de segmentos.")
+
+    @property
+    def has_probabilities(self) -> bool:
+        """GMM y LDA asignan probabilidades por segmento; K-Means sólo la etiqueta."""
+        return self.encoder is not None or hasattr(self.model, "predict_proba")
+
+    def prepare(self, df: pd.DataFrame) -> Any:
+        """Aplica la misma limpieza o codificación que en el entrenamiento."""
+        if self.encoder is not None:
+            return self.encoder.transform(df[self.variables])
+        cleaner = DataCleaner(scaler=self.scaler, dtype=self.dtype)
+        cleaner.means_ = self.means
+        return cleaner.transform(df)
+
+    def assign(self, df: pd.DataFrame) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Returns:
+            labels: segmento de cada fila.
+            probas: probabilidades por segmento (None en K-Means).
+        """
+        X = self.prepare(df)
+        if self.encoder is not None:
+            probas = self.model.transform(X)
+        elif hasattr(self.model, "predict_proba"):
+            probas = self.model.predict_proba(X)
+        else:
+            return self.model.predict(X), None
+        return np.argmax(probas, axis=1), probas
+
+    def save(self, target) -> None:
+        """Guarda el artefacto en `target` (ruta o buffer)."""
+        joblib.dump(self, target, compress=3)
+
+    def to_bytes(self) -> bytes:
+        buffer = BytesIO()
+        self.save(buffer)
+        return buffer.getvalue()
+
+    @staticmethod
+    def load(source) -> "SegmentationArtifact":
+        """Carga un artefacto guardado con `save` (ruta o buffer)."""
+        artifact = joblib.load(source)
+        if not isinstance(artifact, SegmentationArtifact):
+            raise ValueError("El archivo no contiene un modelo de segmentación.")
+        if artifact.sklearn_version != sklearn.__version__:
+            warnings.warn(
+                f"El modelo se guardó con scikit-learn {artifact.sklearn_version} y se "
+                f"carga con {sklearn.__version__}; las asignaciones podrían variar.")
+        return artifact
+
+
+def _score_chunk(artifact: SegmentationArtifact, chunk: pd.DataFrame,
+                 id_col: Optional[str]) -> pd.DataFrame:
+    """Asigna un bloque; se ejecuta en los trabajadores de joblib."""
+    labels, probas = artifact.assign(chunk)
+    out = {}
+    if id_col:
+        out[id_col] = chunk[id_col].to_numpy()
+    out['cluster'] = labels
+    if probas is not None:
+        for j in range(probas.shape[1]):
+            out[f'prob_{j}'] = probas[:, j].astype(np.float32)
+    return pd.DataFrame(out)
+
+
+class BatchScorer:
+    """
+    Asigna segmentos a un CSV de clientes nuevos sin cargarlo entero en memoria.
+
+    El CSV se lee por bloques de `chunksize` filas (sólo el ID y las variables del
+    modelo) y cada bloque se asigna en un trabajador de joblib. Como mucho hay
+    2 × n_jobs bloques en vuelo, así que la memoria no depende del tamaño del archivo;
+    los resultados se escriben en orden a medida que llegan.
+    """
+
+    def __init__(self, artifact: SegmentationArtifact,
+                 chunksize: int = config.SCORING_CHUNKSIZE, n_jobs: int = 1):
+        self.artifact = artifact
+        self.chunksize = chunksize
+        self.n_jobs = n_jobs
+
+    def _chunks(self, source, id_col: Optional[str]) -> Iterator[pd.DataFrame]:
+        columns = self.artifact.variables + ([id_col] if id_col else [])
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source, usecols=columns, chunksize=self.chunksize)
+
+    def iter_scores(self, source, id_col: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Asignaciones de cada bloque, en el orden del archivo."""
+        chunks = self._chunks(source, id_col)
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if n_jobs <= 1:
+            for chunk in chunks:
+                yield _score_chunk(self.artifact, chunk, id_col)
+            return
+        with limited_parallel(n_jobs, return_as="generator",
+                              pre_dispatch="2*n_jobs") as parallel:
+            results = parallel(
+                delayed(_score_chunk)(self.artifact, chunk, id_col) for chunk in chunks)
+            try:
+                yield from results
+            finally:
+                results.close()
+
+    @profiled
+    def score_csv(self, source, out_path: str, id_col: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Escribe en `out_path` un CSV con el ID, el segmento y (GMM/LDA) sus probabilidades.
+
+        Returns:
+            Resumen con el número de filas y de clientes por segmento.
+        """
+        id_col = id_col if id_col is not None else self.artifact.id_col
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        rows = 0
+        counts = np.zeros(self.artifact.k, dtype=np.int64)
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            for i, scored in enumerate(self.iter_scores(source, id_col)):
+                scored.to_csv(f, header=i == 0, index=False, float_format="%.6g")
+                rows += len(scored)
+                counts += np.bincount(scored['cluster'], minlength=self.artifact.k)
+        os.replace(tmp, out_path)
+        return {"filas": rows, "por_segmento": counts.tolist()}
+
+
+def score_csv(
+    artifact_path: str,
+    source,
+    out_path: str,
+    id_col: Optional[str] = None,
+    chunksize: int = config.SCORING_CHUNKSIZE,
+    n_jobs: int = 1
+) -> Dict[str, Any]:
+    """Función de conveniencia: carga el artefacto y asigna el CSV `source`."""
+    artifact = SegmentationArtifact.load(artifact_path)
+    return BatchScorer(artifact, chunksize=chunksize, n_jobs=n_jobs).score_csv(
+        source, out_path, id_col)